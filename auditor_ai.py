@@ -40,16 +40,30 @@ Curso: Aprendizado de Máquina
 """
 
 import os
+import re
+import sqlite3
+import asyncio
+import atexit
+import base64
+import functools
 import logging
 import hashlib
-from typing import List, Dict, Any, Optional, Union
+import heapq
+import inspect
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from operator import itemgetter
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from urllib.parse import quote_plus
+import httpx
+import numpy as np
 import pandas as pd
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, AsyncResult, GraphDatabase, Result, RoutingControl
 import openai
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
@@ -61,7 +75,825 @@ logger = logging.getLogger(__name__)
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# Credenciais lidas uma única vez, na importação, e usadas por todas as funções
+_OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+_NEO4J_URI = os.getenv("NEO4J_URI")
+_NEO4J_USER = os.getenv("NEO4J_USERNAME")
+_NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+_SUPABASE_URL = os.getenv("SUPABASE_URL")
+_SUPABASE_USER = os.getenv("SUPABASE_USER")
+_SUPABASE_PASSWORD = os.getenv("SUPABASE_PASSWORD")
 
+# Conexões mantidas abertas no pool do SQLAlchemy (PostgreSQL)
+POSTGRES_POOL_SIZE = 5
+# Conexões mantidas abertas pelo driver do Neo4j entre consultas
+NEO4J_MAX_CONNECTIONS = int(os.getenv("NEO4J_POOL_SIZE", "50"))
+# Segundos que uma consulta espera por uma conexão livre do pool antes de falhar
+NEO4J_ACQUISITION_TIMEOUT = 30
+# Conexões HTTPS com a API da OpenAI (total e mantidas abertas entre chamadas)
+OPENAI_MAX_CONNECTIONS = 50
+OPENAI_MAX_KEEPALIVE = 20
+# Threads que executam as buscas de auditor_ai() em paralelo (compartilhadas entre perguntas)
+SEARCH_WORKERS = 16
+# Modelo e dimensões dos embeddings (devem ser iguais aos de ingest_data.py)
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSION = 512
+# Embeddings de consultas mantidos em memória (LRU)
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+# Máximo de textos por requisição à API de embeddings (limite da OpenAI)
+QUERY_EMBEDDING_BATCH_SIZE = 2048
+# Arquivo SQLite opcional que guarda embeddings de consultas entre execuções
+# (mesmo formato do cache do ingest_data.py, então pode ser o mesmo arquivo)
+QUERY_EMBEDDING_CACHE_FILE = os.getenv("QUERY_EMBEDDING_CACHE_FILE")
+# Hashes por consulta a esse arquivo (o SQLite limita os parâmetros de uma
+# consulta, a 999 em versões antigas)
+QUERY_EMBEDDING_LOOKUP_SIZE = 900
+# Resultados de buscas (lexicais, semânticas e em grafo) mantidos em memória e
+# sua validade (segundos)
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_TTL = 300
+# Respostas do LLM reaproveitadas quando a mesma pergunta (normalizada) chega
+# com as mesmas despesas de contexto, e sua validade (segundos)
+ANSWER_CACHE_SIZE = 256
+ANSWER_CACHE_TTL = 3600
+# Candidatos explorados pelo índice HNSW por busca semântica (recall x latência)
+HNSW_EF_SEARCH = 64
+# Consultas semânticas mais curtas que isso (sem espaços) não geram embedding
+MIN_SEMANTIC_QUERY_LENGTH = 3
+# A partir de quantos itens (somando todas as listas) o RRF é vetorizado com
+# numpy/pandas; abaixo disso um laço com dicionário é mais rápido
+RRF_VECTORIZE_MIN_ITEMS = 1000
+# Falhas seguidas que desativam uma busca e por quantos segundos ela fica
+# desativada (falha imediata, sem ir ao banco) antes de ser tentada de novo
+CIRCUIT_FAIL_MAX = 3
+CIRCUIT_RESET_TIMEOUT = 30
+# Despesas enviadas ao LLM (top do ranking RRF)
+MAX_CONTEXT_EXPENSES = 15
+# Reranking opcional (AUDITOR_RERANK=1) com um cross-encoder local: o RRF
+# seleciona RERANK_CANDIDATES despesas e só as RERANK_TOP_N mais relevantes
+# para a pergunta vão ao prompt, que fica menor e é gerado mais rápido
+RERANK_ENABLED = os.getenv("AUDITOR_RERANK") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "BAAI/bge-reranker-base")
+RERANK_CANDIDATES = 40
+RERANK_TOP_N = 5
+
+# Consultas Cypher de search_graph_patterns, por tipo de análise. Definidas uma
+# única vez para que o texto enviado ao Neo4j seja sempre idêntico e o plano de
+# execução em cache no servidor seja reaproveitado entre chamadas. Cada registro
+# traz uma única coluna, `despesa`, já montada como mapa pelo próprio Neo4j
+GRAPH_PATTERN_QUERIES = {
+    # Encontrar outros deputados que pagaram o mesmo fornecedor
+    "fornecedor_deputados": """
+        MATCH (f:Fornecedor {cnpj: $param_value})<-[r:PAGOU]-(d:Deputado)
+        WITH d, f, COUNT(r) AS num_transacoes, SUM(r.valor) AS total_pago
+        RETURN {
+            nome_deputado: d.nome,
+            nome_fornecedor: f.nome,
+            cnpj_fornecedor: f.cnpj,
+            num_transacoes: num_transacoes,
+            total_pago: total_pago
+        } AS despesa
+        ORDER BY total_pago DESC
+        LIMIT $limit
+    """,
+    # Encontrar fornecedores pagos por um deputado específico; o nome é
+    # buscado no índice full-text (criado pelo ingest_data.py) em vez de
+    # varrer todos os deputados com LOWER(...) CONTAINS. Todos os deputados
+    # encontrados são expandidos (um nome parcial como "silva" casa com
+    # vários), como na consulta original
+    "deputado_fornecedores": """
+        CALL db.index.fulltext.queryNodes('deputado_nome_fulltext', $param_value)
+        YIELD node AS d
+        MATCH (d)-[r:PAGOU]->(f:Fornecedor)
+        WITH d, f, COUNT(r) AS num_transacoes, SUM(r.valor) AS total_pago
+        RETURN {
+            nome_deputado: d.nome,
+            nome_fornecedor: f.nome,
+            cnpj_fornecedor: f.cnpj,
+            num_transacoes: num_transacoes,
+            total_pago: total_pago
+        } AS despesa
+        ORDER BY total_pago DESC
+        LIMIT $limit
+    """,
+    # Encontrar deputados com despesas acima de um valor. O LIMIT vem antes
+    # de buscar deputado e fornecedor: o índice pagou_valor entrega as
+    # relações já ordenadas e só $limit delas são expandidas e projetadas
+    "valor_alto": """
+        MATCH ()-[r:PAGOU]->()
+        WHERE r.valor >= $param_value
+        WITH r
+        ORDER BY r.valor DESC
+        LIMIT $limit
+        MATCH (d:Deputado)-[r]->(f:Fornecedor)
+        RETURN {
+            nome_deputado: d.nome,
+            nome_fornecedor: f.nome,
+            cnpj_fornecedor: f.cnpj,
+            descricao_despesa: r.descricao,
+            valor: r.valor,
+            data_despesa: r.data
+        } AS despesa
+        ORDER BY r.valor DESC
+        LIMIT $limit
+    """,
+}
+
+# Reserva de deputado_fornecedores: o índice full-text só casa prefixos de
+# palavras ("silv" encontra "Silva", "ilva" não). Quando ele não encontra
+# ninguém, a busca é repetida com o CONTAINS original, que casa qualquer
+# trecho do nome (mas varre todos os deputados)
+DEPUTADO_FORNECEDORES_CONTAINS_QUERY = """
+    MATCH (d:Deputado)-[r:PAGOU]->(f:Fornecedor)
+    WHERE toLower(d.nome) CONTAINS toLower($param_value)
+    WITH d, f, COUNT(r) AS num_transacoes, SUM(r.valor) AS total_pago
+    RETURN {
+        nome_deputado: d.nome,
+        nome_fornecedor: f.nome,
+        cnpj_fornecedor: f.cnpj,
+        num_transacoes: num_transacoes,
+        total_pago: total_pago
+    } AS despesa
+    ORDER BY total_pago DESC
+    LIMIT $limit
+"""
+
+# Consultas SQL de search_lexical, por tipo de busca. Como as Cypher acima,
+# montadas uma única vez (text() não é recompilado a cada chamada). O termo
+# de busca chega já em minúsculas e a coluna nome_deputado_lower é gerada
+# pelo banco na escrita, então nenhum LOWER() é calculado na consulta. A
+# coluna e os índices usados (trigramas em nome_deputado_lower e (cnpj, data))
+# são criados pelo ingest_data.py
+LEXICAL_QUERIES = {
+    # Busca por nome de deputado (case-insensitive, com LIKE)
+    "deputado": text("""
+        SELECT 
+            nome_deputado,
+            cnpj_fornecedor,
+            nome_fornecedor,
+            descricao_despesa,
+            valor,
+            data_despesa
+        FROM despesas_parlamentares
+        WHERE nome_deputado_lower LIKE :query
+        ORDER BY data_despesa DESC
+        LIMIT :limit
+    """),
+    # Busca por CNPJ do fornecedor
+    "cnpj": text("""
+        SELECT 
+            nome_deputado,
+            cnpj_fornecedor,
+            nome_fornecedor,
+            descricao_despesa,
+            valor,
+            data_despesa
+        FROM despesas_parlamentares
+        WHERE cnpj_fornecedor = :query
+        ORDER BY data_despesa DESC
+        LIMIT :limit
+    """),
+}
+
+# Busca vetorial de _nearest_expenses (assumindo extensão pgvector).
+# Os embeddings são armazenados normalizados, então o operador <#>
+# (produto interno negativo) ordena igual à distância de cosseno e
+# usa o índice HNSW halfvec_ip_ops; 1 + (<#>) devolve a distância de cosseno.
+# O HNSW devolve no máximo ef_search candidatos: o set_config (válido só
+# para esta transação) garante que cubra o limite pedido e vai no mesmo
+# envio que a busca, economizando uma ida e volta ao banco
+SEMANTIC_QUERY = text("""
+    SELECT set_config('hnsw.ef_search', :ef_search, true);
+    SELECT 
+        nome_deputado,
+        cnpj_fornecedor,
+        nome_fornecedor,
+        descricao_despesa,
+        valor,
+        data_despesa,
+        1 + (descricao_embedding <#> CAST(:query_embedding AS halfvec)) AS distance
+    FROM despesas_parlamentares
+    WHERE descricao_embedding IS NOT NULL
+    ORDER BY descricao_embedding <#> CAST(:query_embedding AS halfvec)
+    LIMIT :limit
+""")
+
+# Versão de SEMANTIC_QUERY para várias consultas em um único envio: cada
+# embedding vira uma linha (unnest) e o LATERAL faz, para cada uma, a mesma
+# busca no índice HNSW. `ord` identifica a consulta de origem de cada linha
+SEMANTIC_BATCH_QUERY = text("""
+    SELECT set_config('hnsw.ef_search', :ef_search, true);
+    SELECT 
+        q.ord,
+        d.*
+    FROM unnest(CAST(:query_embeddings AS text[])) WITH ORDINALITY AS q(embedding, ord)
+    CROSS JOIN LATERAL (
+        SELECT 
+            nome_deputado,
+            cnpj_fornecedor,
+            nome_fornecedor,
+            descricao_despesa,
+            valor,
+            data_despesa,
+            1 + (descricao_embedding <#> CAST(q.embedding AS halfvec)) AS distance
+        FROM despesas_parlamentares
+        WHERE descricao_embedding IS NOT NULL
+        ORDER BY descricao_embedding <#> CAST(q.embedding AS halfvec)
+        LIMIT :limit
+    ) AS d
+    ORDER BY q.ord, d.distance
+""")
+
+# Resposta quando nenhuma busca encontra despesas
+NO_EXPENSES_ANSWER = (
+    "Desculpe, não encontrei despesas parlamentares relevantes para sua pergunta. "
+    "Tente reformular sua pergunta ou verificar se os dados estão disponíveis no sistema."
+)
+
+# Caracteres com significado especial na sintaxe de consulta do Lucene
+_LUCENE_SPECIAL_RE = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def _neo4j_driver_config() -> Dict[str, Any]:
+    """
+    Monta os argumentos dos drivers do Neo4j (síncrono e assíncrono).
+    
+    Returns:
+        Dict[str, Any]: URI, credenciais e configuração do pool de conexões
+    
+    Raises:
+        ValueError: Se variáveis de ambiente do Neo4j não estiverem configuradas
+    """
+    if not all([_NEO4J_URI, _NEO4J_USER, _NEO4J_PASSWORD]):
+        raise ValueError(
+            "Missing required Neo4j environment variables. "
+            "Please set NEO4J_URI, NEO4J_USERNAME, and NEO4J_PASSWORD."
+        )
+    
+    return {
+        'uri': _NEO4J_URI,
+        'auth': (_NEO4J_USER, _NEO4J_PASSWORD),
+        'max_connection_pool_size': NEO4J_MAX_CONNECTIONS,
+        'connection_acquisition_timeout': NEO4J_ACQUISITION_TIMEOUT,
+    }
+
+
+@functools.lru_cache(maxsize=1)
+def _get_neo4j_driver():
+    """
+    Retorna o driver do Neo4j compartilhado por todas as consultas ao grafo.
+    
+    O driver é criado na primeira chamada e reutilizado nas seguintes, evitando
+    o handshake TCP/TLS e a autenticação Bolt a cada consulta. Ele é fechado
+    automaticamente ao final do processo.
+    
+    Returns:
+        neo4j.Driver: Driver com pool de conexões
+    
+    Raises:
+        ValueError: Se variáveis de ambiente do Neo4j não estiverem configuradas
+    """
+    driver = GraphDatabase.driver(**_neo4j_driver_config())
+    atexit.register(driver.close)
+    return driver
+
+
+# Drivers assíncronos do Neo4j, um por event loop (um AsyncDriver só pode ser
+# usado no loop em que foi criado); descartados junto com o loop
+_async_neo4j_drivers = weakref.WeakKeyDictionary()
+# Clientes AsyncOpenAI, um por event loop pelo mesmo motivo (o pool do
+# httpx.AsyncClient pertence ao loop em que as conexões foram abertas)
+_async_openai_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_neo4j_driver():
+    """
+    Retorna o driver assíncrono do Neo4j do event loop em execução.
+    
+    Criado na primeira consulta feita no loop e reutilizado pelas seguintes,
+    com a mesma configuração de pool do driver síncrono. Aplicações devem
+    chamar close_async_resources() antes de encerrar o loop.
+    
+    Returns:
+        neo4j.AsyncDriver: Driver com pool de conexões
+    
+    Raises:
+        ValueError: Se variáveis de ambiente do Neo4j não estiverem configuradas
+    """
+    loop = asyncio.get_running_loop()
+    driver = _async_neo4j_drivers.get(loop)
+    if driver is None:
+        driver = AsyncGraphDatabase.driver(**_neo4j_driver_config())
+        _async_neo4j_drivers[loop] = driver
+    return driver
+
+
+def _get_async_openai_client() -> openai.AsyncOpenAI:
+    """
+    Retorna o cliente assíncrono da OpenAI do event loop em execução.
+    
+    Criado na primeira chamada feita no loop, com o mesmo pool HTTP
+    (keep-alive, HTTP/2 opcional) do cliente síncrono. Aplicações devem
+    chamar close_async_resources() antes de encerrar o loop.
+    
+    Returns:
+        openai.AsyncOpenAI: Cliente configurado com OPENAI_API_KEY
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=_OPENAI_API_KEY,
+            http_client=httpx.AsyncClient(**_openai_http_options())
+        )
+        _async_openai_clients[loop] = client
+    return client
+
+
+async def close_async_resources():
+    """
+    Fecha o driver do Neo4j e o cliente da OpenAI assíncronos do event loop
+    em execução.
+    
+    Deve ser aguardada no encerramento de aplicações que usam
+    auditor_ai_async() (ex: no evento de shutdown do servidor).
+    """
+    loop = asyncio.get_running_loop()
+    driver = _async_neo4j_drivers.pop(loop, None)
+    if driver is not None:
+        await driver.close()
+    client = _async_openai_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+
+def _fulltext_name_query(name: str) -> str:
+    """
+    Converte um nome (ou parte dele) em consulta para o índice full-text.
+    
+    Cada palavra vira um prefixo obrigatório ("joão silva" -> "+joão* +silva*"),
+    aproximando o antigo CONTAINS por palavra. A correspondência é mais
+    estreita que a do CONTAINS: um trecho do meio da palavra ("ilva") não
+    encontra "Silva"; nesse caso search_graph_patterns repete a busca com
+    DEPUTADO_FORNECEDORES_CONTAINS_QUERY. Caracteres especiais do Lucene
+    são escapados, então o texto do usuário não altera a estrutura da consulta.
+    
+    Args:
+        name (str): Nome ou trecho do nome do deputado
+    
+    Returns:
+        str: Consulta Lucene ("" se o nome não tiver nenhuma palavra)
+    """
+    terms = [_LUCENE_SPECIAL_RE.sub(r'\\\1', term) for term in str(name).lower().split()]
+    return " ".join(f"+{term}*" for term in terms)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_postgres_engine():
+    """
+    Retorna o engine do SQLAlchemy compartilhado pelas buscas no PostgreSQL.
+    
+    O engine mantém um pool de conexões abertas, então cada busca reaproveita
+    uma conexão já autenticada em vez de abrir (e descartar) uma nova. O pool
+    é fechado automaticamente ao final do processo.
+    
+    Returns:
+        sqlalchemy.engine.Engine: Engine com pool de conexões
+    
+    Raises:
+        ValueError: Se variáveis de ambiente do PostgreSQL não estiverem configuradas
+    """
+    # Credenciais do Postgres (lidas na importação do módulo)
+    if not all([_SUPABASE_URL, _SUPABASE_USER, _SUPABASE_PASSWORD]):
+        raise ValueError(
+            "Missing required Postgres environment variables. "
+            "Please set SUPABASE_URL, SUPABASE_USER, and SUPABASE_PASSWORD."
+        )
+    
+    # Construir connection string do PostgreSQL com codificação segura
+    encoded_user = quote_plus(_SUPABASE_USER)
+    encoded_password = quote_plus(_SUPABASE_PASSWORD)
+    connection_string = f"postgresql+psycopg2://{encoded_user}:{encoded_password}@{_SUPABASE_URL}"
+    
+    # pool_pre_ping descarta conexões derrubadas pelo servidor enquanto ociosas
+    engine = create_engine(
+        connection_string,
+        pool_size=POSTGRES_POOL_SIZE,
+        pool_pre_ping=True
+    )
+    atexit.register(engine.dispose)
+    return engine
+
+
+def _openai_http_options() -> Dict[str, Any]:
+    """
+    Opções do cliente HTTP (httpx) dos clientes síncrono e assíncrono da OpenAI.
+    
+    Returns:
+        Dict[str, Any]: Argumentos para httpx.Client / httpx.AsyncClient
+    """
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    
+    return {
+        'http2': http2,
+        'limits': httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE
+        ),
+    }
+
+
+@functools.lru_cache(maxsize=1)
+def _get_openai_client() -> openai.OpenAI:
+    """
+    Retorna o cliente da OpenAI compartilhado por todas as chamadas à API.
+    
+    O cliente HTTP mantém conexões keep-alive (e HTTP/2, se o pacote opcional
+    `h2` estiver instalado), então cada consulta reaproveita a conexão TLS já
+    aberta em vez de refazer DNS e handshake.
+    
+    Returns:
+        openai.OpenAI: Cliente configurado com OPENAI_API_KEY
+    """
+    client = openai.OpenAI(api_key=_OPENAI_API_KEY, http_client=httpx.Client(**_openai_http_options()))
+    atexit.register(client.close)
+    return client
+
+
+@functools.lru_cache(maxsize=1)
+def _get_search_executor() -> ThreadPoolExecutor:
+    """
+    Retorna o pool de threads compartilhado que executa as buscas em paralelo.
+    
+    Criado uma única vez, evita iniciar e encerrar threads a cada pergunta;
+    as threads ociosas ficam disponíveis para a próxima chamada de auditor_ai().
+    
+    Returns:
+        ThreadPoolExecutor: Pool com até SEARCH_WORKERS threads
+    """
+    executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="auditor-search")
+    atexit.register(executor.shutdown, wait=False)
+    return executor
+
+
+def _ttl_cache(func):
+    """
+    Memoiza os resultados de uma função de busca por RESULT_CACHE_TTL segundos.
+    
+    Consultas repetidas (mesmos argumentos) dentro da validade não voltam ao
+    banco. O cache guarda no máximo RESULT_CACHE_SIZE entradas, descartando as
+    mais antigas, e conta acertos/falhas para cache_stats().
+    
+    Args:
+        func: Função de busca (síncrona ou `async def`) com argumentos
+            hasheáveis que retorna uma lista
+    
+    Returns:
+        Função decorada, com os atributos cache_clear() e cache_stats()
+    """
+    entries = {}
+    stats = {'hits': 0, 'misses': 0}
+    lock = threading.Lock()
+    
+    def lookup(key, now):
+        with lock:
+            entry = entries.get(key)
+            if entry and entry[0] > now:
+                stats['hits'] += 1
+                return entry[1]
+            stats['misses'] += 1
+            return None
+    
+    def store(key, now, result):
+        with lock:
+            entries.pop(key, None)
+            if len(entries) >= RESULT_CACHE_SIZE:
+                entries.pop(next(iter(entries)))
+            entries[key] = (now + RESULT_CACHE_TTL, result)
+    
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            cached = lookup(key, now)
+            if cached is not None:
+                return list(cached)
+            result = await func(*args, **kwargs)
+            store(key, now, result)
+            return list(result)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            cached = lookup(key, now)
+            if cached is not None:
+                return list(cached)
+            result = func(*args, **kwargs)
+            store(key, now, result)
+            return list(result)
+    
+    def cache_clear():
+        with lock:
+            entries.clear()
+    
+    wrapper.cache_clear = cache_clear
+    wrapper.cache_stats = lambda: dict(stats)
+    return wrapper
+
+
+class CircuitOpenError(RuntimeError):
+    """Busca desativada temporariamente após CIRCUIT_FAIL_MAX falhas seguidas."""
+
+
+def _circuit_breaker(name: str):
+    """
+    Desativa uma função de busca por um tempo após falhas seguidas.
+    
+    Depois de CIRCUIT_FAIL_MAX falhas consecutivas, as chamadas seguintes
+    falham na hora com CircuitOpenError durante CIRCUIT_RESET_TIMEOUT
+    segundos, em vez de esperar cada uma o timeout de um banco fora do ar.
+    Passado esse tempo a próxima chamada é tentada: um sucesso zera o
+    contador e uma nova falha reabre o circuito. ValueError (configuração ou
+    argumentos inválidos) não conta como falha. Retentativas de erros
+    transitórios já são feitas pelos próprios clientes (Neo4j execute_query,
+    pool_pre_ping do SQLAlchemy e o cliente da OpenAI).
+    
+    Args:
+        name (str): Nome do circuito, usado nas mensagens de erro
+    
+    Returns:
+        Decorador para funções síncronas ou `async def`
+    """
+    state = {'failures': 0, 'open_until': 0.0}
+    lock = threading.Lock()
+    
+    def before():
+        with lock:
+            remaining = state['open_until'] - time.monotonic()
+        if remaining > 0:
+            raise CircuitOpenError(
+                f"{name} disabled for {remaining:.0f}s after "
+                f"{CIRCUIT_FAIL_MAX} consecutive failures"
+            )
+    
+    def after(error: Optional[BaseException]):
+        with lock:
+            if error is None:
+                state['failures'] = 0
+            elif not isinstance(error, ValueError):
+                state['failures'] += 1
+                if state['failures'] >= CIRCUIT_FAIL_MAX:
+                    state['open_until'] = time.monotonic() + CIRCUIT_RESET_TIMEOUT
+    
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                before()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    after(e)
+                    raise
+                after(None)
+                return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                before()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    after(e)
+                    raise
+                after(None)
+                return result
+        return wrapper
+    
+    return decorator
+
+
+# Um circuito por tipo de busca; as versões síncrona e assíncrona da busca em
+# grafo compartilham o mesmo, pois dependem do mesmo servidor Neo4j
+_postgres_lexical_circuit = _circuit_breaker("search_lexical")
+_postgres_semantic_circuit = _circuit_breaker("search_semantic")
+_neo4j_circuit = _circuit_breaker("search_graph_patterns")
+
+
+# Cache LRU dos embeddings de consultas: texto -> vetor normalizado
+_query_embeddings: "OrderedDict[str, tuple]" = OrderedDict()
+_query_embeddings_lock = threading.Lock()
+_query_embeddings_stats = {'hits': 0, 'misses': 0, 'disk_hits': 0}
+_query_embedding_store_lock = threading.Lock()
+
+# Cache LRU de respostas: digest(pergunta, despesas) -> (expira_em, resposta)
+_answers: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+_answers_lock = threading.Lock()
+_answers_stats = {'hits': 0, 'misses': 0}
+
+# Falhas por busca (descrição de _plan_searches -> contagem), para monitoramento
+_search_failures: Dict[str, int] = defaultdict(int)
+_search_failures_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_query_embedding_store() -> Optional[sqlite3.Connection]:
+    """
+    Abre o cache em disco de embeddings de consultas, se configurado.
+    
+    As chaves são digests BLAKE2b do texto (com EMBEDDING_MODEL e
+    EMBEDDING_DIMENSION como prefixo) e os valores os bytes float16 do vetor,
+    o mesmo formato do EmbeddingCache do ingest_data.py.
+    
+    Returns:
+        Optional[sqlite3.Connection]: Conexão compartilhada, ou None se
+            QUERY_EMBEDDING_CACHE_FILE não estiver definida
+    """
+    if not QUERY_EMBEDDING_CACHE_FILE:
+        return None
+    
+    store = sqlite3.connect(QUERY_EMBEDDING_CACHE_FILE, check_same_thread=False)
+    with _query_embedding_store_lock:
+        store.execute("CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB)")
+        store.commit()
+    atexit.register(store.close)
+    return store
+
+
+def _query_embedding_key(query_text: str) -> bytes:
+    """Chave do texto no cache em disco (igual à do EmbeddingCache do ingest)."""
+    return hashlib.blake2b(
+        f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSION}:{query_text}".encode('utf-8'), digest_size=16
+    ).digest()
+
+
+def _normalize_rows(vectors: np.ndarray) -> List[tuple]:
+    """Normaliza cada linha para norma 1 (produto interno = cosseno) e devolve tuplas."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return list(map(tuple, (vectors / norms).tolist()))
+
+
+def _embed_queries(query_texts: List[str]) -> List[tuple]:
+    """
+    Gera os embeddings normalizados de várias consultas, com cache LRU em memória.
+    
+    Perguntas repetidas reutilizam o vetor já calculado; as que não estão em
+    memória são procuradas no cache em disco (se QUERY_EMBEDDING_CACHE_FILE
+    estiver definida) e só as restantes são enviadas à API da OpenAI em uma
+    única requisição (até QUERY_EMBEDDING_BATCH_SIZE textos por requisição).
+    
+    Args:
+        query_texts (List[str]): Textos das consultas
+    
+    Returns:
+        List[tuple]: Um embedding (EMBEDDING_DIMENSION floats, norma 1) por
+            texto, na mesma ordem; tuplas para que o cache seja imutável
+    """
+    embeddings = {}
+    with _query_embeddings_lock:
+        for query_text in query_texts:
+            if query_text in _query_embeddings:
+                _query_embeddings.move_to_end(query_text)
+                embeddings[query_text] = _query_embeddings[query_text]
+                _query_embeddings_stats['hits'] += 1
+            else:
+                _query_embeddings_stats['misses'] += 1
+    
+    missing = [query_text for query_text in dict.fromkeys(query_texts) if query_text not in embeddings]
+    
+    # Procurar no cache em disco o que não estava em memória
+    store = _get_query_embedding_store() if missing else None
+    if store is not None:
+        by_key = {_query_embedding_key(query_text): query_text for query_text in missing}
+        keys = list(by_key)
+        rows = []
+        with _query_embedding_store_lock:
+            for start in range(0, len(keys), QUERY_EMBEDDING_LOOKUP_SIZE):
+                batch = keys[start:start + QUERY_EMBEDDING_LOOKUP_SIZE]
+                rows += store.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+        if rows:
+            found = [by_key[key] for key, _ in rows]
+            vectors = np.stack([np.frombuffer(vec, dtype=np.float16) for _, vec in rows]).astype(np.float32)
+            embeddings.update(zip(found, _normalize_rows(vectors)))
+            with _query_embeddings_lock:
+                _query_embeddings_stats['disk_hits'] += len(found)
+    
+    to_fetch = [query_text for query_text in missing if query_text not in embeddings]
+    for start in range(0, len(to_fetch), QUERY_EMBEDDING_BATCH_SIZE):
+        batch = to_fetch[start:start + QUERY_EMBEDDING_BATCH_SIZE]
+        # Vetores em base64 decodificados direto para float32, sem passar pela
+        # lista de floats Python que o SDK montaria para cada um
+        response = _get_openai_client().embeddings.create(
+            input=batch,
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSION,
+            encoding_format="base64"
+        )
+        vectors = np.empty((len(batch), EMBEDDING_DIMENSION), dtype=np.float32)
+        for d in response.data:
+            vectors[d.index] = np.frombuffer(base64.b64decode(d.embedding), dtype='<f4')
+        
+        # Normalizar as queries para que o produto interno seja o cosseno
+        normalized = _normalize_rows(vectors)
+        embeddings.update(zip(batch, normalized))
+        
+        if store is not None:
+            with _query_embedding_store_lock:
+                store.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                    [
+                        (_query_embedding_key(query_text), np.asarray(vector, dtype=np.float16).tobytes())
+                        for query_text, vector in zip(batch, normalized)
+                    ]
+                )
+                store.commit()
+    
+    if missing:
+        with _query_embeddings_lock:
+            for query_text in missing:
+                _query_embeddings[query_text] = embeddings[query_text]
+            while len(_query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embeddings.popitem(last=False)
+    
+    return [embeddings[query_text] for query_text in query_texts]
+
+
+def _embed_query(query_text: str) -> tuple:
+    """
+    Gera o embedding normalizado de uma consulta (ver _embed_queries).
+    
+    Args:
+        query_text (str): Texto da consulta
+    
+    Returns:
+        tuple: Embedding (EMBEDDING_DIMENSION floats) com norma 1
+    """
+    return _embed_queries([query_text])[0]
+
+
+def clear_caches():
+    """
+    Invalida os caches de embeddings, de resultados de busca e de respostas.
+    
+    Deve ser chamada após uma nova ingestão de dados.
+    """
+    with _query_embeddings_lock:
+        _query_embeddings.clear()
+    with _answers_lock:
+        _answers.clear()
+    search_lexical.cache_clear()
+    search_semantic.cache_clear()
+    search_graph_patterns.cache_clear()
+    search_graph_patterns_async.cache_clear()
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Retorna contadores de acertos e falhas de cada cache.
+    
+    Returns:
+        Dict[str, Dict[str, int]]: {'nome_do_cache': {'hits': n, 'misses': m}}
+    """
+    with _query_embeddings_lock:
+        embedding_stats = dict(_query_embeddings_stats)
+    with _answers_lock:
+        answer_stats = dict(_answers_stats)
+    return {
+        'query_embedding': embedding_stats,
+        'answer': answer_stats,
+        'search_lexical': search_lexical.cache_stats(),
+        'search_semantic': search_semantic.cache_stats(),
+        'search_graph_patterns': search_graph_patterns.cache_stats(),
+        'search_graph_patterns_async': search_graph_patterns_async.cache_stats(),
+    }
+
+
+def search_failure_stats() -> Dict[str, int]:
+    """
+    Retorna quantas vezes cada busca falhou (e foi ignorada na fusão).
+    
+    Inclui as recusas do circuit breaker (CircuitOpenError), então um número
+    crescente indica um banco fora do ar ou lento.
+    
+    Returns:
+        Dict[str, int]: {'descrição da busca': falhas}, ex: {'Graph pattern search': 3}
+    """
+    with _search_failures_lock:
+        return dict(_search_failures)
+
+
+@_ttl_cache
+@_postgres_lexical_circuit
 def search_lexical(query: str, search_type: str = "deputado", limit: int = 10) -> List[Dict[str, Any]]:
     """
     Realiza busca lexical (SQL) no PostgreSQL por deputado ou fornecedor.
@@ -102,85 +934,98 @@ def search_lexical(query: str, search_type: str = "deputado", limit: int = 10) -
         Utiliza queries parametrizadas do SQLAlchemy para prevenir SQL injection.
         Todas as queries usam o padrão :parameter para binding seguro.
     """
-    # Obter credenciais do Postgres
-    db_url = os.getenv("SUPABASE_URL")
-    db_user = os.getenv("SUPABASE_USER")
-    db_password = os.getenv("SUPABASE_PASSWORD")
+    if search_type not in ("deputado", "cnpj"):
+        raise ValueError(f"Invalid search_type: {search_type}. Must be 'deputado' or 'cnpj'")
     
-    if not all([db_url, db_user, db_password]):
-        raise ValueError(
-            "Missing required Postgres environment variables. "
-            "Please set SUPABASE_URL, SUPABASE_USER, and SUPABASE_PASSWORD."
-        )
+    # Termo vazio: o LIKE '%%' casaria com a tabela inteira, então nem consultar
+    if not query or not query.strip():
+        return []
     
-    # Construir connection string do PostgreSQL com codificação segura
-    encoded_user = quote_plus(db_user)
-    encoded_password = quote_plus(db_password)
-    connection_string = f"postgresql://{encoded_user}:{encoded_password}@{db_url}"
+    # Engine compartilhado (pool de conexões criado na primeira consulta)
+    engine = _get_postgres_engine()
     
-    # Criar engine do SQLAlchemy
-    engine = create_engine(connection_string)
+    # SECURITY: Uses SQLAlchemy text() with parameterized query (:query, :limit)
+    # to prevent SQL injection. All SQL queries in this file follow this pattern.
+    if search_type == "deputado":
+        # Minúsculas aplicadas uma vez aqui, não pelo banco a cada linha
+        params = {"query": f"%{query.lower()}%", "limit": limit}
+    else:
+        params = {"query": query, "limit": limit}
     
-    try:
-        with engine.connect() as connection:
-            if search_type == "deputado":
-                # Busca por nome de deputado (case-insensitive, com LIKE)
-                # SECURITY: Uses SQLAlchemy text() with parameterized query (:query, :limit)
-                # to prevent SQL injection. All SQL queries in this file follow this pattern.
-                sql_query = text("""
-                    SELECT 
-                        nome_deputado,
-                        cnpj_fornecedor,
-                        nome_fornecedor,
-                        descricao_despesa,
-                        valor,
-                        data_despesa
-                    FROM despesas_parlamentares
-                    WHERE LOWER(nome_deputado) LIKE LOWER(:query)
-                    ORDER BY data_despesa DESC
-                    LIMIT :limit
-                """)
-                result = connection.execute(
-                    sql_query, 
-                    {"query": f"%{query}%", "limit": limit}
-                )
-            elif search_type == "cnpj":
-                # Busca por CNPJ do fornecedor
-                # SECURITY: Uses SQLAlchemy text() with parameterized query (:query, :limit)
-                sql_query = text("""
-                    SELECT 
-                        nome_deputado,
-                        cnpj_fornecedor,
-                        nome_fornecedor,
-                        descricao_despesa,
-                        valor,
-                        data_despesa
-                    FROM despesas_parlamentares
-                    WHERE cnpj_fornecedor = :query
-                    ORDER BY data_despesa DESC
-                    LIMIT :limit
-                """)
-                result = connection.execute(
-                    sql_query, 
-                    {"query": query, "limit": limit}
-                )
-            else:
-                raise ValueError(f"Invalid search_type: {search_type}. Must be 'deputado' or 'cnpj'")
-            
-            # Converter resultados para lista de dicionários
-            rows = result.fetchall()
-            columns = result.keys()
-            
-            results = []
-            for row in rows:
-                results.append(dict(zip(columns, row)))
-            
-            return results
+    with engine.connect() as connection:
+        result = connection.execute(LEXICAL_QUERIES[search_type], params)
+        
+        # Converter resultados para lista de dicionários (nomes das colunas
+        # resolvidos uma vez, não a cada linha)
+        columns = tuple(result.keys())
+        return [dict(zip(columns, row)) for row in result.fetchall()]
+
+
+def _nearest_expenses(connection, query_embedding: tuple, limit: int) -> List[Dict[str, Any]]:
+    """
+    Busca as despesas mais próximas de um embedding normalizado (pgvector/HNSW).
     
-    finally:
-        engine.dispose()
+    Args:
+        connection: Conexão SQLAlchemy
+        query_embedding (tuple): Embedding normalizado da consulta
+        limit (int): Número máximo de resultados
+    
+    Returns:
+        List[Dict[str, Any]]: Despesas no formato de search_semantic()
+    """
+    # Converter embedding para string formatada para PostgreSQL
+    embedding_str = f"[{','.join(map(str, query_embedding))}]"
+    
+    result = connection.execute(
+        SEMANTIC_QUERY,
+        {
+            "query_embedding": embedding_str,
+            "limit": limit,
+            "ef_search": str(max(HNSW_EF_SEARCH, limit))
+        }
+    )
+    
+    # Converter resultados para lista de dicionários
+    columns = tuple(result.keys())
+    return [dict(zip(columns, row)) for row in result.fetchall()]
+
+
+def _nearest_expenses_batch(connection, query_embeddings: List[tuple],
+                            limit: int) -> List[List[Dict[str, Any]]]:
+    """
+    Versão de _nearest_expenses para vários embeddings em uma ida ao banco.
+    
+    Args:
+        connection: Conexão SQLAlchemy
+        query_embeddings (List[tuple]): Embeddings normalizados das consultas
+        limit (int): Número máximo de resultados por consulta
+    
+    Returns:
+        List[List[Dict[str, Any]]]: Despesas de cada consulta, na mesma ordem
+            de query_embeddings, no formato de search_semantic()
+    """
+    result = connection.execute(
+        SEMANTIC_BATCH_QUERY,
+        {
+            "query_embeddings": [
+                f"[{','.join(map(str, embedding))}]" for embedding in query_embeddings
+            ],
+            "limit": limit,
+            "ef_search": str(max(HNSW_EF_SEARCH, limit))
+        }
+    )
+    
+    # Primeira coluna (ord, 1-indexed) diz a que consulta a linha pertence
+    columns = tuple(result.keys())[1:]
+    results = [[] for _ in query_embeddings]
+    for ord_, *row in result.fetchall():
+        results[ord_ - 1].append(dict(zip(columns, row)))
+    
+    return results
 
 
+@_ttl_cache
+@_postgres_semantic_circuit
 def search_semantic(query_text: str, limit: int = 10) -> List[Dict[str, Any]]:
     """
     Realiza busca semântica usando embeddings vetoriais no PostgreSQL.
@@ -227,111 +1072,158 @@ def search_semantic(query_text: str, limit: int = 10) -> List[Dict[str, Any]]:
         ...     print(f"{r['nome_deputado']}: R$ {r['valor']:.2f}")
     
     Implementação Técnica:
-        - Modelo de embedding: text-embedding-3-small (1536 dimensões)
-        - Métrica de similaridade: Distância de cosseno (<=> operator)
-        - Índice: HNSW (Hierarchical Navigable Small World) para performance
+        - Modelo de embedding: text-embedding-3-small reduzido a 512 dimensões
+        - Métrica de similaridade: Produto interno (<#> operator) sobre vetores
+          normalizados, equivalente à distância de cosseno
+        - Índice: HNSW (Hierarchical Navigable Small World) para performance,
+          com ef_search = max(HNSW_EF_SEARCH, limit)
+        - Cache: consultas repetidas reutilizam o embedding já calculado (LRU)
+          e, dentro de RESULT_CACHE_TTL, o próprio resultado da busca
     """
     # Validar API key do OpenAI
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not openai_api_key:
+    if not _OPENAI_API_KEY:
         raise ValueError(
             "Missing OPENAI_API_KEY environment variable. "
             "Please set OPENAI_API_KEY to generate embeddings."
         )
     
-    # Obter credenciais do Postgres
-    db_url = os.getenv("SUPABASE_URL")
-    db_user = os.getenv("SUPABASE_USER")
-    db_password = os.getenv("SUPABASE_PASSWORD")
-    
-    if not all([db_url, db_user, db_password]):
-        raise ValueError(
-            "Missing required Postgres environment variables. "
-            "Please set SUPABASE_URL, SUPABASE_USER, and SUPABASE_PASSWORD."
-        )
+    # Consulta vazia ou curta demais: não vale uma chamada à OpenAI nem ao banco
+    if not query_text or len(query_text.strip()) < MIN_SEMANTIC_QUERY_LENGTH:
+        return []
     
-    # Gerar embedding para a query usando OpenAI
-    client = openai.OpenAI(api_key=openai_api_key)
+    # Engine compartilhado (pool de conexões criado na primeira consulta)
+    engine = _get_postgres_engine()
     
+    # Gerar embedding normalizado para a query (cacheado por texto)
     try:
-        response = client.embeddings.create(
-            input=query_text,
-            model="text-embedding-3-small"
-        )
-        query_embedding = response.data[0].embedding
+        query_embedding = _embed_query(query_text)
     except Exception as e:
         raise RuntimeError(
             f"Failed to generate embeddings using OpenAI API. "
             f"Error: {e}"
         )
     
-    # Construir connection string do PostgreSQL com codificação segura
-    encoded_user = quote_plus(db_user)
-    encoded_password = quote_plus(db_password)
-    connection_string = f"postgresql://{encoded_user}:{encoded_password}@{db_url}"
-    
-    # Criar engine do SQLAlchemy
-    engine = create_engine(connection_string)
-    
-    try:
-        with engine.connect() as connection:
-            # Busca vetorial usando operador de distância (assumindo extensão pgvector)
-            # Usa operador <=> para distância de cosseno
-            sql_query = text("""
-                SELECT 
-                    nome_deputado,
-                    cnpj_fornecedor,
-                    nome_fornecedor,
-                    descricao_despesa,
-                    valor,
-                    data_despesa,
-                    (descricao_embedding <=> CAST(:query_embedding AS vector)) AS distance
-                FROM despesas_parlamentares
-                WHERE descricao_embedding IS NOT NULL
-                ORDER BY descricao_embedding <=> CAST(:query_embedding AS vector)
-                LIMIT :limit
-            """)
-            
-            # Converter embedding para string formatada para PostgreSQL
-            embedding_str = f"[{','.join(map(str, query_embedding))}]"
-            
-            result = connection.execute(
-                sql_query,
-                {"query_embedding": embedding_str, "limit": limit}
-            )
-            
-            # Converter resultados para lista de dicionários
-            rows = result.fetchall()
-            columns = result.keys()
-            
-            results = []
-            for row in rows:
-                results.append(dict(zip(columns, row)))
-            
-            return results
-    
-    finally:
-        engine.dispose()
+    with engine.connect() as connection:
+        return _nearest_expenses(connection, query_embedding, limit)
 
 
-def search_graph_patterns(query_type: str, param_value: Union[str, float, int], limit: int = 10) -> List[Dict[str, Any]]:
+def search_semantic_batch(query_texts: List[str], limit: int = 10) -> List[List[Dict[str, Any]]]:
     """
-    Consulta padrões complexos no grafo de relacionamentos do Neo4j.
+    Executa search_semantic() para várias consultas de uma só vez.
     
-    Esta função utiliza o poder dos bancos de dados de grafos para identificar
-    padrões e relações entre deputados e fornecedores que seriam difíceis de
-    detectar com queries SQL tradicionais.
+    Os embeddings de todas as consultas são gerados em uma única requisição à
+    OpenAI (em vez de uma por consulta) e as buscas vetoriais vão ao banco em
+    um único comando. Útil para avaliações e reprocessamentos em lote.
     
-    Tipos de Análise Disponíveis:
-    -----------------------------
+    Args:
+        query_texts (List[str]): Perguntas ou descrições em linguagem natural
+        limit (int): Número máximo de resultados por consulta (padrão: 10)
     
-    1. **fornecedor_deputados**: Rede de deputados que pagaram um fornecedor
-       - Identifica fornecedores que recebem de múltiplos deputados
-       - Útil para detectar concentração de pagamentos
-       - Retorna: deputados, número de transações, total pago
+    Returns:
+        List[List[Dict[str, Any]]]: Resultados de cada consulta, na mesma ordem
+            de query_texts, no formato de search_semantic()
     
-    2. **deputado_fornecedores**: Rede de fornecedores de um deputado
-       - Mostra todos os fornecedores contratados por um deputado
+    Raises:
+        ValueError: Se OPENAI_API_KEY não estiver configurada
+        ValueError: Se variáveis de ambiente do PostgreSQL não estiverem configuradas
+        RuntimeError: Se falhar ao gerar embeddings via API da OpenAI
+    
+    Exemplo:
+        >>> resultados = search_semantic_batch(["gastos com viagens", "aluguel de carros"])
+        >>> print([len(r) for r in resultados])
+    """
+    # Validar API key do OpenAI
+    if not _OPENAI_API_KEY:
+        raise ValueError(
+            "Missing OPENAI_API_KEY environment variable. "
+            "Please set OPENAI_API_KEY to generate embeddings."
+        )
+    
+    # Consultas vazias ou curtas demais não são buscadas (resultado vazio)
+    valid = [
+        query_text for query_text in query_texts
+        if query_text and len(query_text.strip()) >= MIN_SEMANTIC_QUERY_LENGTH
+    ]
+    if not valid:
+        return [[] for _ in query_texts]
+    
+    # Engine compartilhado (pool de conexões criado na primeira consulta)
+    engine = _get_postgres_engine()
+    
+    try:
+        embeddings = dict(zip(valid, _embed_queries(valid)))
+    except Exception as e:
+        raise RuntimeError(
+            f"Failed to generate embeddings using OpenAI API. "
+            f"Error: {e}"
+        )
+    
+    # Uma ida ao banco para todas as consultas, em vez de uma por consulta
+    with engine.connect() as connection:
+        results = dict(zip(
+            embeddings,
+            _nearest_expenses_batch(connection, list(embeddings.values()), limit)
+        ))
+    
+    return [list(results.get(query_text, [])) for query_text in query_texts]
+
+
+def _graph_pattern_query(query_type: str, param_value: Union[str, float, int],
+                         limit: int) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Escolhe a consulta Cypher de search_graph_patterns e prepara seus parâmetros.
+    
+    Args:
+        query_type (str): Tipo de análise (ver search_graph_patterns)
+        param_value (Union[str, float, int]): Parâmetro da análise
+        limit (int): Número máximo de resultados
+    
+    Returns:
+        Tuple[Optional[str], Dict[str, Any]]: Consulta e parâmetros; a consulta
+            é None quando não há o que buscar (nome de deputado vazio)
+    
+    Raises:
+        ValueError: Se query_type for inválido
+    """
+    query = GRAPH_PATTERN_QUERIES.get(query_type)
+    if query is None:
+        raise ValueError(
+            f"Invalid query_type: {query_type}. "
+            f"Must be 'fornecedor_deputados', 'deputado_fornecedores', or 'valor_alto'"
+        )
+    
+    params = {'param_value': param_value, 'limit': limit}
+    if query_type == "valor_alto":
+        params['param_value'] = float(param_value)
+    elif query_type == "deputado_fornecedores":
+        params['param_value'] = _fulltext_name_query(param_value)
+        if not params['param_value']:
+            query = None
+    return query, params
+
+
+@_ttl_cache
+@_neo4j_circuit
+def search_graph_patterns(query_type: str, param_value: Union[str, float, int], limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Consulta padrões complexos no grafo de relacionamentos do Neo4j.
+    
+    Esta função utiliza o poder dos bancos de dados de grafos para identificar
+    padrões e relações entre deputados e fornecedores que seriam difíceis de
+    detectar com queries SQL tradicionais.
+    
+    Tipos de Análise Disponíveis:
+    -----------------------------
+    
+    1. **fornecedor_deputados**: Rede de deputados que pagaram um fornecedor
+       - Identifica fornecedores que recebem de múltiplos deputados
+       - Útil para detectar concentração de pagamentos
+       - Retorna: deputados, número de transações, total pago
+    
+    2. **deputado_fornecedores**: Rede de fornecedores de um deputado
+       - Mostra todos os fornecedores contratados por um deputado
+       - O nome é buscado por prefixo de palavra no índice full-text; se
+         nada for encontrado, por qualquer trecho do nome (CONTAINS)
        - Identifica preferências e padrões de contratação
        - Retorna: fornecedores, frequência, valor total
     
@@ -379,91 +1271,92 @@ def search_graph_patterns(query_type: str, param_value: Union[str, float, int],
         Utiliza queries parametrizadas do Neo4j ($param) para prevenir
         Cypher injection. O driver Neo4j sanitiza automaticamente os parâmetros.
     """
-    # Obter credenciais do Neo4j
-    neo4j_uri = os.getenv("NEO4J_URI")
-    neo4j_user = os.getenv("NEO4J_USERNAME")
-    neo4j_password = os.getenv("NEO4J_PASSWORD")
-    
-    if not all([neo4j_uri, neo4j_user, neo4j_password]):
-        raise ValueError(
-            "Missing required Neo4j environment variables. "
-            "Please set NEO4J_URI, NEO4J_USERNAME, and NEO4J_PASSWORD."
+    query, params = _graph_pattern_query(query_type, param_value, limit)
+    # Nome vazio: nenhum deputado a procurar, evitar a ida ao Neo4j
+    if query is None:
+        return []
+    
+    # Driver compartilhado (criado na primeira consulta). execute_query roda a
+    # consulta em uma transação de leitura gerenciada (com retry, roteável para
+    # réplicas do cluster) e Result.value() busca todos os registros de uma só
+    # vez, devolvendo o mapa `despesa` de cada um sem remontá-lo em Python
+    driver = _get_neo4j_driver()
+    records = driver.execute_query(
+        query,
+        params,
+        routing_=RoutingControl.READ,
+        result_transformer_=Result.value
+    )
+    # Nenhum deputado com palavra começando pelo trecho: tentar o CONTAINS
+    if not records and query_type == "deputado_fornecedores":
+        records = driver.execute_query(
+            DEPUTADO_FORNECEDORES_CONTAINS_QUERY,
+            {'param_value': str(param_value).strip(), 'limit': limit},
+            routing_=RoutingControl.READ,
+            result_transformer_=Result.value
         )
+    return records
+
+
+@_ttl_cache
+@_neo4j_circuit
+async def search_graph_patterns_async(query_type: str, param_value: Union[str, float, int],
+                                      limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Versão assíncrona de search_graph_patterns(), usando o driver async do Neo4j.
     
-    # Criar driver do Neo4j
-    driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+    A consulta não ocupa uma thread enquanto espera o servidor: o event loop
+    segue atendendo as demais buscas e requisições.
     
-    try:
-        with driver.session() as session:
-            if query_type == "fornecedor_deputados":
-                # Encontrar outros deputados que pagaram o mesmo fornecedor
-                query = """
-                MATCH (f:Fornecedor {cnpj: $param_value})<-[:PAGOU]-(d:Deputado)
-                OPTIONAL MATCH (d)-[r:PAGOU]->(f)
-                WITH d, f, COUNT(r) AS num_transacoes, SUM(r.valor) AS total_pago
-                RETURN 
-                    d.nome AS nome_deputado,
-                    f.nome AS nome_fornecedor,
-                    f.cnpj AS cnpj_fornecedor,
-                    num_transacoes,
-                    total_pago
-                ORDER BY total_pago DESC
-                LIMIT $limit
-                """
-                result = session.run(query, param_value=param_value, limit=limit)
-                
-            elif query_type == "deputado_fornecedores":
-                # Encontrar fornecedores pagos por um deputado específico
-                query = """
-                MATCH (d:Deputado)-[r:PAGOU]->(f:Fornecedor)
-                WHERE LOWER(d.nome) CONTAINS LOWER($param_value)
-                WITH d, f, COUNT(r) AS num_transacoes, SUM(r.valor) AS total_pago
-                RETURN 
-                    d.nome AS nome_deputado,
-                    f.nome AS nome_fornecedor,
-                    f.cnpj AS cnpj_fornecedor,
-                    num_transacoes,
-                    total_pago
-                ORDER BY total_pago DESC
-                LIMIT $limit
-                """
-                result = session.run(query, param_value=param_value, limit=limit)
-                
-            elif query_type == "valor_alto":
-                # Encontrar deputados com despesas acima de um valor
-                query = """
-                MATCH (d:Deputado)-[r:PAGOU]->(f:Fornecedor)
-                WHERE r.valor >= $param_value
-                RETURN 
-                    d.nome AS nome_deputado,
-                    f.nome AS nome_fornecedor,
-                    f.cnpj AS cnpj_fornecedor,
-                    r.descricao AS descricao_despesa,
-                    r.valor AS valor,
-                    r.data AS data_despesa
-                ORDER BY r.valor DESC
-                LIMIT $limit
-                """
-                result = session.run(query, param_value=float(param_value), limit=limit)
-                
-            else:
-                raise ValueError(
-                    f"Invalid query_type: {query_type}. "
-                    f"Must be 'fornecedor_deputados', 'deputado_fornecedores', or 'valor_alto'"
-                )
-            
-            # Converter resultados para lista de dicionários
-            results = []
-            for record in result:
-                results.append(dict(record))
-            
-            return results
+    Args:
+        query_type (str): Tipo de análise (ver search_graph_patterns)
+        param_value (Union[str, float, int]): Parâmetro da análise
+        limit (int): Número máximo de resultados (padrão: 10)
     
-    finally:
-        driver.close()
+    Returns:
+        List[Dict[str, Any]]: Mesmo formato de search_graph_patterns()
+    
+    Raises:
+        ValueError: Se variáveis de ambiente do Neo4j não estiverem configuradas
+        ValueError: Se query_type for inválido
+    """
+    query, params = _graph_pattern_query(query_type, param_value, limit)
+    if query is None:
+        return []
+    
+    driver = _get_async_neo4j_driver()
+    records = await driver.execute_query(
+        query,
+        params,
+        routing_=RoutingControl.READ,
+        result_transformer_=AsyncResult.value
+    )
+    if not records and query_type == "deputado_fornecedores":
+        records = await driver.execute_query(
+            DEPUTADO_FORNECEDORES_CONTAINS_QUERY,
+            {'param_value': str(param_value).strip(), 'limit': limit},
+            routing_=RoutingControl.READ,
+            result_transformer_=AsyncResult.value
+        )
+    return records
+
+
+@functools.lru_cache(maxsize=32)
+def _rrf_weights(k: int, length: int) -> Tuple[float, ...]:
+    """Pesos 1 / (k + rank) para rank = 1..length, calculados uma vez por (k, length)."""
+    return tuple(1.0 / (k + rank) for rank in range(1, length + 1))
 
 
-def reciprocal_rank_fusion(search_results: List[List[str]], k: int = 60) -> pd.DataFrame:
+@functools.lru_cache(maxsize=16)
+def _rrf_weight_array(k: int, length: int) -> np.ndarray:
+    """Os mesmos pesos de _rrf_weights como array NumPy (somente leitura, pois fica em cache)."""
+    weights = 1.0 / (k + np.arange(1, length + 1, dtype=np.float64))
+    weights.setflags(write=False)
+    return weights
+
+
+def reciprocal_rank_fusion(search_results: List[List[str]], k: int = 60, top_n: Optional[int] = None,
+                           as_dataframe: bool = True) -> Union[pd.DataFrame, List[Tuple[str, float]]]:
     """
     Aplica o algoritmo Reciprocal Rank Fusion (RRF) para combinar múltiplos rankings.
     
@@ -490,146 +1383,598 @@ def reciprocal_rank_fusion(search_results: List[List[str]], k: int = 60) -> pd.D
     - Robusto a diferenças de tamanho entre listas
     
     Args:
-        search_results (List[List[str]]): Lista de rankings, onde cada ranking
-            é uma lista de IDs ordenados por relevância (primeiro = mais relevante)
-        k (int): Constante de suavização RRF (padrão: 60, valor recomendado na literatura)
+        search_results (List[List[str]]): Lista de rankings, onde cada ranking
+            é uma lista de IDs ordenados por relevância (primeiro = mais relevante)
+        k (int): Constante de suavização RRF (padrão: 60, valor recomendado na literatura)
+        top_n (Optional[int]): Se informado, retorna apenas os top_n itens de maior
+            score, selecionados sem ordenar o conjunto inteiro (padrão: None = todos)
+        as_dataframe (bool): Se False, retorna uma lista de tuplas em vez do
+            DataFrame, sem o custo de montá-lo (padrão: True)
+    
+    Returns:
+        pd.DataFrame: DataFrame com colunas 'despesa_id' e 'rrf_score',
+            ordenado por rrf_score em ordem decrescente (maior score = mais relevante).
+            Com as_dataframe=False, a mesma tabela como List[Tuple[str, float]]
+            de pares (despesa_id, rrf_score)
+    
+    Exemplo:
+        >>> # Três buscas diferentes retornam resultados parcialmente sobrepostos
+        >>> lexical_results = ['id1', 'id2', 'id3']
+        >>> semantic_results = ['id1', 'id4', 'id5']
+        >>> graph_results = ['id2', 'id1', 'id6']
+        >>> 
+        >>> fused = reciprocal_rank_fusion(
+        ...     [lexical_results, semantic_results, graph_results],
+        ...     k=60
+        ... )
+        >>> print(fused.head())
+        #   despesa_id  rrf_score
+        # 0       id1   0.049180  <- Aparece em todas as 3 listas
+        # 1       id2   0.032895  <- Aparece em 2 listas
+        
+    Referência:
+        Cormack, G. V., Clarke, C. L., & Buettcher, S. (2009).
+        Reciprocal rank fusion outperforms condorcet and individual rank 
+        learning methods. SIGIR '09.
+    """
+    # Listas vazias não contribuem com nenhum item; top_n <= 0 não pede nenhum
+    non_empty = [search_result for search_result in search_results if len(search_result)]
+    if not non_empty or (top_n is not None and top_n <= 0):
+        return pd.DataFrame(columns=['despesa_id', 'rrf_score']) if as_dataframe else []
+    
+    total_items = sum(map(len, non_empty))
+    
+    # Poucos itens (caso típico: algumas buscas com ~10 resultados): o custo
+    # fixo do pandas domina, então somar em um dicionário é mais barato
+    if total_items < RRF_VECTORIZE_MIN_ITEMS:
+        # 1 / (k + rank) calculado uma vez por posição, não por (lista, posição),
+        # e reaproveitado entre chamadas (as buscas quase sempre têm o mesmo limit)
+        weights = _rrf_weights(k, max(map(len, non_empty)))
+        rrf_scores: Dict[str, float] = {}
+        for search_result in non_empty:
+            # zip anda junto com os pesos: sem tupla do enumerate nem indexação.
+            # dict.get em vez de defaultdict: cada ID novo no defaultdict passa
+            # por __missing__, o que deixa o laço ~20% mais lento. O hash do ID
+            # (str) fica em cache no próprio objeto e é calculado uma só vez
+            for despesa_id, weight in zip(search_result, weights):
+                rrf_scores[despesa_id] = rrf_scores.get(despesa_id, 0.0) + weight
+        
+        if as_dataframe:
+            # Colunas montadas direto de dois arrays (sem a lista de tuplas que
+            # o pandas percorreria para inferir os tipos); argsort estável
+            # mantém os empates na ordem da primeira aparição
+            despesa_ids = np.fromiter(rrf_scores.keys(), dtype=object, count=len(rrf_scores))
+            rrf_values = np.fromiter(rrf_scores.values(), dtype=np.float64, count=len(rrf_scores))
+            order = np.argsort(-rrf_values, kind='stable')[:top_n]
+            return pd.DataFrame({'despesa_id': despesa_ids[order], 'rrf_score': rrf_values[order]})
+        
+        # sorted e heapq.nlargest são estáveis: empates mantêm a ordem da
+        # primeira aparição. Com top_n, a seleção custa O(N log top_n)
+        if top_n is None or top_n >= len(rrf_scores):
+            return sorted(rrf_scores.items(), key=itemgetter(1), reverse=True)
+        return heapq.nlargest(top_n, rrf_scores.items(), key=itemgetter(1))
+    
+    # Pesos 1 / (k + rank) por posição (rank 1-indexed), em cache entre chamadas
+    weights = _rrf_weight_array(k, max(map(len, non_empty)))
+    
+    # Achatar todas as listas em dois arrays paralelos: ID e contribuição (os
+    # IDs vão direto para um único array, sem um array intermediário por lista)
+    ids = np.fromiter(chain.from_iterable(non_empty), dtype=object, count=total_items)
+    contributions = np.concatenate([weights[:len(search_result)] for search_result in non_empty])
+    
+    # Somar as contribuições por despesa: factorize numera os IDs na ordem da
+    # primeira aparição (uma tabela hash em C, sem dicionário Python) e
+    # bincount soma os pesos de cada número de uma vez (mais rápido que
+    # np.add.at, que faz a mesma soma com indexação genérica). O laço de soma
+    # já roda em C, então compilá-lo (ex.: Numba) não traria ganho
+    codes, unique_ids = pd.factorize(ids)
+    totals = np.bincount(codes, weights=contributions, minlength=len(unique_ids))
+    
+    # Quando só o topo interessa, np.partition acha em O(N) o menor score que
+    # entra no top_n; só os candidatos com score >= a ele (todos os empatados
+    # incluídos, para o desempate por aparição ser exato) são ordenados
+    if top_n is not None and 0 < top_n < len(totals):
+        cutoff = np.partition(totals, len(totals) - top_n)[len(totals) - top_n]
+        candidates = np.flatnonzero(totals >= cutoff)
+        selected = candidates[np.argsort(-totals[candidates], kind='stable')[:top_n]]
+        totals, unique_ids = totals[selected], unique_ids[selected]
+    
+    # Ordenar por rrf_score decrescente direto no NumPy (argsort estável sobre
+    # o score negado: empates mantêm a ordem de aparição), sem o sort_values
+    # e o reset_index do pandas. No caso top_n os selecionados já estão
+    # ordenados e isto é quase grátis
+    order = np.argsort(-totals, kind='stable')
+    unique_ids, totals = unique_ids[order], totals[order]
+    
+    if not as_dataframe:
+        return list(zip(unique_ids.tolist(), totals.tolist()))
+    return pd.DataFrame({'despesa_id': unique_ids, 'rrf_score': totals})
+
+
+def format_expense_context(expenses: List[Dict[str, Any]]) -> str:
+    """
+    Formata lista de despesas em texto estruturado para o LLM.
+    
+    Esta função converte dados estruturados de despesas em um formato textual
+    legível que será usado como contexto para o Large Language Model (LLM).
+    A formatação é otimizada para facilitar a análise do modelo.
+    
+    Args:
+        expenses (List[Dict[str, Any]]): Lista de dicionários de despesas, onde cada
+            dicionário pode conter:
+            - nome_deputado: Nome do deputado
+            - nome_fornecedor: Nome do fornecedor
+            - cnpj_fornecedor: CNPJ/CPF do fornecedor
+            - descricao_despesa: Descrição da despesa
+            - valor: Valor monetário
+            - data_despesa: Data da transação
+            - num_transacoes: (opcional) Número de transações agregadas
+            - total_pago: (opcional) Total pago em múltiplas transações
+    
+    Returns:
+        str: Texto formatado com todas as despesas, uma por parágrafo.
+             Se a lista estiver vazia, retorna "Nenhuma despesa encontrada."
+    
+    Exemplo de Saída:
+        ```
+        Despesa 1:
+        - Deputado: João Silva
+        - Fornecedor: Empresa ABC Ltda
+        - CNPJ: 12345678000190
+        - Descrição: Locação de veículos
+        - Valor: R$ 15000.00
+        - Data: 2024-03-15
+        
+        Despesa 2:
+        - Deputado: Maria Santos
+        - Fornecedor: Consultoria XYZ
+        - CNPJ: 98765432000110
+        - Descrição: Serviços de consultoria
+        - Valor: R$ 45000.00
+        - Data: 2024-02-20
+        ```
+    """
+    if not expenses:
+        return "Nenhuma despesa encontrada."
+    
+    context_parts = []
+    
+    for i, expense in enumerate(expenses, 1):
+        expense_text = f"Despesa {i}:\n"
+        expense_text += f"- Deputado: {expense.get('nome_deputado', 'N/A')}\n"
+        expense_text += f"- Fornecedor: {expense.get('nome_fornecedor', 'N/A')}\n"
+        expense_text += f"- CNPJ: {expense.get('cnpj_fornecedor', 'N/A')}\n"
+        expense_text += f"- Descrição: {expense.get('descricao_despesa', 'N/A')}\n"
+        expense_text += f"- Valor: R$ {expense.get('valor', 0):.2f}\n"
+        expense_text += f"- Data: {expense.get('data_despesa', 'N/A')}\n"
+        
+        # Adicionar informações extras se disponíveis (de buscas de padrões)
+        if 'num_transacoes' in expense:
+            expense_text += f"- Número de Transações: {expense.get('num_transacoes')}\n"
+        if 'total_pago' in expense:
+            expense_text += f"- Total Pago: R$ {expense.get('total_pago', 0):.2f}\n"
+        
+        context_parts.append(expense_text)
+    
+    return "\n".join(context_parts)
+
+
+def _create_expense_id(expense):
+    """
+    Cria um ID único para uma despesa baseado em seus campos principais.
+    
+    Usa hash SHA256 para garantir IDs consistentes e determinísticos.
+    
+    Args:
+        expense: Dicionário contendo informações da despesa
+    
+    Returns:
+        str: ID único para a despesa
+    """
+    # Criar ID baseado em campos-chave para identificação única
+    id_parts = [
+        str(expense.get('nome_deputado', '')),
+        str(expense.get('cnpj_fornecedor', '')),
+        str(expense.get('valor', '')),
+        str(expense.get('data_despesa', ''))
+    ]
+    # Usar hashlib.sha256 para criar um ID determinístico
+    id_string = '|'.join(id_parts)
+    return hashlib.sha256(id_string.encode('utf-8')).hexdigest()[:16]
+
+
+def _plan_searches(user_question: str, search_strategies: Dict[str, Any]) -> List[tuple]:
+    """
+    Converte as estratégias pedidas em uma lista de buscas a executar.
+    
+    Args:
+        user_question (str): Pergunta do cidadão (usada na busca semântica)
+        search_strategies (Dict[str, Any]): Estratégias, como em auditor_ai()
+    
+    Returns:
+        List[tuple]: (descrição para log, função de busca, args, kwargs) por busca
+    """
+    # Montar as buscas solicitadas: (descrição para log, função, argumentos).
+    # Cada busca é uma única consulta (uma ida ao banco); as lexicais vão ao
+    # PostgreSQL e a de grafo ao Neo4j, então não há como juntá-las em uma
+    # só instrução, e elas rodam em paralelo
+    searches = []
+    
+    # Busca Lexical por Deputado
+    if 'lexical_deputado' in search_strategies:
+        searches.append((
+            "Lexical search by deputado",
+            search_lexical,
+            (search_strategies['lexical_deputado'],),
+            {'search_type': "deputado", 'limit': 10}
+        ))
+    
+    # Busca Lexical por CNPJ
+    if 'lexical_cnpj' in search_strategies:
+        searches.append((
+            "Lexical search by CNPJ",
+            search_lexical,
+            (search_strategies['lexical_cnpj'],),
+            {'search_type': "cnpj", 'limit': 10}
+        ))
+    
+    # Busca Semântica
+    if search_strategies.get('semantic'):
+        searches.append((
+            "Semantic search",
+            search_semantic,
+            (user_question,),
+            {'limit': 10}
+        ))
+    
+    # Busca de Padrões no Grafo
+    if 'graph_patterns' in search_strategies:
+        pattern_config = search_strategies['graph_patterns']
+        searches.append((
+            "Graph pattern search",
+            search_graph_patterns,
+            (pattern_config.get('type'), pattern_config.get('value')),
+            {'limit': 10}
+        ))
+    
+    return searches
+
+
+def _fuse_search_results(outcomes: List[tuple], limit: int = MAX_CONTEXT_EXPENSES) -> List[Dict[str, Any]]:
+    """
+    Combina os resultados das buscas nas despesas que irão para o LLM.
+    
+    Buscas que falharam são registradas no log e ignoradas. Com mais de uma
+    lista não vazia de resultados aplica-se RRF; com uma só, a ordem original
+    é mantida.
+    
+    Args:
+        outcomes (List[tuple]): (descrição, lista de despesas ou exceção) por
+            busca, na ordem em que as buscas foram planejadas
+        limit (int): Máximo de despesas retornadas (padrão: MAX_CONTEXT_EXPENSES)
+    
+    Returns:
+        List[Dict[str, Any]]: Até `limit` despesas, da mais para a menos relevante
+    """
+    # Coletar resultados de diferentes buscas para aplicar RRF
+    search_result_lists = []
+    all_expenses_dict = {}  # Para armazenar os detalhes das despesas
+    
+    for label, results in outcomes:
+        if isinstance(results, BaseException):
+            with _search_failures_lock:
+                _search_failures[label] += 1
+            # Formatação adiada: só acontece se o nível WARNING estiver ativo
+            logger.warning("%s failed: %s", label, results)
+            continue
+        # Lista vazia não contribui para o RRF; descartá-la aqui faz com que
+        # uma única busca com resultados siga o caminho direto abaixo
+        if not results:
+            continue
+        
+        # Criar IDs únicos para cada despesa
+        result_ids = []
+        for expense in results:
+            expense_id = _create_expense_id(expense)
+            result_ids.append(expense_id)
+            all_expenses_dict[expense_id] = expense
+        search_result_lists.append(result_ids)
+    
+    # Aplicar Reciprocal Rank Fusion se houver múltiplos resultados
+    if len(search_result_lists) > 1:
+        # Usar RRF para combinar e rankear resultados (só os IDs interessam,
+        # então sem montar o DataFrame)
+        fused = reciprocal_rank_fusion(search_result_lists, k=60, top_n=limit, as_dataframe=False)
+        # Pegar os top resultados ranqueados
+        top_expense_ids = [despesa_id for despesa_id, _ in fused]
+        # Recuperar as despesas correspondentes
+        final_expenses = [all_expenses_dict[exp_id] for exp_id in top_expense_ids if exp_id in all_expenses_dict]
+    elif len(search_result_lists) == 1:
+        # Se só temos uma busca, usar os resultados diretos (sem duplicatas)
+        unique_ids = list(dict.fromkeys(search_result_lists[0]))  # Preserva ordem
+        final_expenses = [all_expenses_dict[exp_id] for exp_id in unique_ids[:limit]]
+    else:
+        # Nenhuma busca retornou resultados
+        final_expenses = []
+    
+    return final_expenses
+
+
+@functools.lru_cache(maxsize=1)
+def _get_reranker():
+    """
+    Carrega o cross-encoder usado por _rerank_expenses (uma vez por processo).
+    
+    O pacote sentence-transformers é opcional: sem ele, o reranking é
+    desativado e as despesas seguem na ordem do RRF.
+    
+    Returns:
+        CrossEncoder | None: Modelo RERANK_MODEL, ou None se indisponível
+    """
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        logger.warning("sentence-transformers not installed; reranking disabled")
+        return None
+    return CrossEncoder(RERANK_MODEL)
+
+
+def _rerank_expenses(user_question: str, expenses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Reordena as despesas pela relevância para a pergunta com um cross-encoder.
+    
+    Args:
+        user_question (str): Pergunta do cidadão
+        expenses (List[Dict[str, Any]]): Candidatas selecionadas pelo RRF
+    
+    Returns:
+        List[Dict[str, Any]]: As RERANK_TOP_N despesas de maior score; sem
+            modelo disponível, as RERANK_TOP_N primeiras do RRF
+    """
+    reranker = _get_reranker()
+    if reranker is None or len(expenses) <= 1:
+        return expenses[:RERANK_TOP_N]
+    
+    pairs = [
+        (user_question, " | ".join(
+            str(expense[field]) for field in
+            ('descricao_despesa', 'nome_fornecedor', 'nome_deputado', 'valor')
+            if expense.get(field) is not None
+        ))
+        for expense in expenses
+    ]
+    scores = reranker.predict(pairs)
+    
+    # Ordenação estável por score: empates mantêm a ordem do RRF
+    order = sorted(range(len(expenses)), key=lambda i: scores[i], reverse=True)
+    return [expenses[i] for i in order[:RERANK_TOP_N]]
+
+
+# Prompt de sistema do Auditor Cidadão
+AUDITOR_SYSTEM_PROMPT = """Você é um Auditor Cidadão Imparcial especializado em análise de despesas públicas. 
+
+Sua função é analisar despesas parlamentares de forma crítica e analítica, respondendo às perguntas dos cidadãos de maneira objetiva, clara e baseada em evidências.
+
+SEMPRE cite informações específicas dos dados:
+- Valores EXATOS das despesas (em R$)
+- Nomes COMPLETOS dos deputados envolvidos
+- Nomes e CNPJs das empresas/fornecedores
+- Datas ESPECÍFICAS das transações
+- Descrições DETALHADAS das despesas
+
+Como um auditor profissional, você deve:
+1. ANALISAR CRITICAMENTE os dados apresentados
+2. IDENTIFICAR padrões suspeitos ou incomuns, incluindo:
+   - Valores desproporcionalmente altos para serviços comuns ou genéricos
+   - Concentração de pagamentos: múltiplas transações para o mesmo fornecedor
+   - Descrições vagas ou genéricas combinadas com valores elevados
+   - Padrões temporais suspeitos (ex: gastos concentrados em períodos específicos)
+   - Fornecedores que recebem de múltiplos deputados
+   - Valores atípicos ou outliers em relação à média
+3. QUANTIFICAR sempre que possível (ex: "Total pago: R$ X", "Média de gastos: R$ Y")
+4. CONTEXTUALIZAR os gastos quando relevante
+5. Ser CÉTICO mas JUSTO - apontar tanto aspectos positivos quanto preocupantes
+
+IMPORTANTE: Base suas observações EXCLUSIVAMENTE nos dados fornecidos. Se não houver dados suficientes para uma conclusão, mencione isso explicitamente.
+
+Seja factual, objetivo e mantenha um tom profissional de análise forense financeira."""
+
+# Partes fixas do prompt, montadas uma única vez: cada chamada de
+# _build_audit_prompt apenas concatena o contexto e a pergunta entre elas
+# (sem reconstruir o texto nem interpretar um template a cada pergunta)
+_AUDIT_PROMPT_HEAD = f"{AUDITOR_SYSTEM_PROMPT}\n\nContexto das Despesas Parlamentares:\n"
+_AUDIT_PROMPT_MIDDLE = "\n\nPergunta do Cidadão:\n"
+_AUDIT_PROMPT_TAIL = "\n\nResposta do Auditor:"
+
+
+def _build_audit_prompt(user_question: str, expenses: List[Dict[str, Any]]) -> str:
+    """
+    Monta o prompt do Auditor com as despesas recuperadas e a pergunta.
+    
+    Args:
+        user_question (str): Pergunta do cidadão
+        expenses (List[Dict[str, Any]]): Despesas selecionadas por _fuse_search_results
+    
+    Returns:
+        str: Prompt completo enviado ao LLM
+    """
+    # Formatar contexto
+    context = format_expense_context(expenses)
+    
+    return "".join((_AUDIT_PROMPT_HEAD, context, _AUDIT_PROMPT_MIDDLE, user_question, _AUDIT_PROMPT_TAIL))
+
+
+def _answer_key(user_question: str, expenses: List[Dict[str, Any]]) -> bytes:
+    """
+    Calcula a chave do cache de respostas.
+    
+    A pergunta é normalizada (minúsculas, espaços colapsados) e as despesas
+    entram na ordem do ranking, como aparecem no prompt: a resposta só é
+    reaproveitada se o LLM receberia exatamente a mesma evidência.
+    
+    Args:
+        user_question (str): Pergunta do cidadão
+        expenses (List[Dict[str, Any]]): Despesas selecionadas para o contexto
+    
+    Returns:
+        bytes: Digest BLAKE2b de 16 bytes
+    """
+    normalized_question = ' '.join(user_question.lower().split())
+    key = hashlib.blake2b(normalized_question.encode('utf-8'), digest_size=16)
+    key.update(b'\0')
+    key.update(repr(expenses).encode('utf-8'))
+    return key.digest()
+
+
+def _cached_answer(key: bytes) -> Optional[str]:
+    """
+    Busca uma resposta ainda válida no cache.
+    
+    Args:
+        key (bytes): Chave calculada por _answer_key
     
     Returns:
-        pd.DataFrame: DataFrame com colunas 'despesa_id' e 'rrf_score',
-            ordenado por rrf_score em ordem decrescente (maior score = mais relevante)
-    
-    Exemplo:
-        >>> # Três buscas diferentes retornam resultados parcialmente sobrepostos
-        >>> lexical_results = ['id1', 'id2', 'id3']
-        >>> semantic_results = ['id1', 'id4', 'id5']
-        >>> graph_results = ['id2', 'id1', 'id6']
-        >>> 
-        >>> fused = reciprocal_rank_fusion(
-        ...     [lexical_results, semantic_results, graph_results],
-        ...     k=60
-        ... )
-        >>> print(fused.head())
-        #   despesa_id  rrf_score
-        # 0       id1   0.049180  <- Aparece em todas as 3 listas
-        # 1       id2   0.032895  <- Aparece em 2 listas
-        
-    Referência:
-        Cormack, G. V., Clarke, C. L., & Buettcher, S. (2009).
-        Reciprocal rank fusion outperforms condorcet and individual rank 
-        learning methods. SIGIR '09.
+        Optional[str]: Resposta armazenada, ou None se ausente ou expirada
     """
-    # Dicionário para acumular scores RRF para cada despesa
-    rrf_scores = {}
-    
-    # Iterar através de cada lista de resultados de busca
-    for search_result in search_results:
-        # Iterar através de cada item na lista com seu rank (1-indexed)
-        for rank, item_id in enumerate(search_result, start=1):
-            # Calcular a contribuição para o score RRF
-            score_contribution = 1 / (k + rank)
-            
-            # Adicionar a contribuição ao score total da despesa
-            rrf_scores[item_id] = rrf_scores.get(item_id, 0) + score_contribution
+    with _answers_lock:
+        entry = _answers.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _answers.move_to_end(key)
+            _answers_stats['hits'] += 1
+            return entry[1]
+        _answers.pop(key, None)
+        _answers_stats['misses'] += 1
+        return None
+
+
+def _store_answer(key: bytes, answer: str):
+    """
+    Guarda uma resposta no cache, descartando a menos usada se estiver cheio.
     
-    # Converter o dicionário para DataFrame
-    df = pd.DataFrame(list(rrf_scores.items()), columns=['despesa_id', 'rrf_score'])
+    Args:
+        key (bytes): Chave calculada por _answer_key
+        answer (str): Resposta completa do modelo
+    """
+    with _answers_lock:
+        _answers[key] = (time.monotonic() + ANSWER_CACHE_TTL, answer)
+        _answers.move_to_end(key)
+        while len(_answers) > ANSWER_CACHE_SIZE:
+            _answers.popitem(last=False)
+
+
+def _complete(prompt: str) -> str:
+    """
+    Envia o prompt ao gpt-4o-mini e retorna o texto da resposta.
     
-    # Ordenar por rrf_score em ordem decrescente
-    df = df.sort_values(by='rrf_score', ascending=False).reset_index(drop=True)
+    Args:
+        prompt (str): Prompt montado por _build_audit_prompt
     
-    return df
+    Returns:
+        str: Resposta do modelo
+    """
+    # Chamada direta à API de chat com gpt-4o-mini (cliente compartilhado)
+    completion = _get_openai_client().chat.completions.create(
+        model='gpt-4o-mini',
+        temperature=0.3,  # Temperatura baixa para respostas mais objetivas
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return completion.choices[0].message.content
 
 
-def format_expense_context(expenses: List[Dict[str, Any]]) -> str:
+async def _complete_async(prompt: str) -> str:
     """
-    Formata lista de despesas em texto estruturado para o LLM.
+    Versão assíncrona de _complete, com o cliente AsyncOpenAI do event loop.
     
-    Esta função converte dados estruturados de despesas em um formato textual
-    legível que será usado como contexto para o Large Language Model (LLM).
-    A formatação é otimizada para facilitar a análise do modelo.
+    A espera pela geração (segundos) não ocupa nenhuma thread.
     
     Args:
-        expenses (List[Dict[str, Any]]): Lista de dicionários de despesas, onde cada
-            dicionário pode conter:
-            - nome_deputado: Nome do deputado
-            - nome_fornecedor: Nome do fornecedor
-            - cnpj_fornecedor: CNPJ/CPF do fornecedor
-            - descricao_despesa: Descrição da despesa
-            - valor: Valor monetário
-            - data_despesa: Data da transação
-            - num_transacoes: (opcional) Número de transações agregadas
-            - total_pago: (opcional) Total pago em múltiplas transações
+        prompt (str): Prompt montado por _build_audit_prompt
     
     Returns:
-        str: Texto formatado com todas as despesas, uma por parágrafo.
-             Se a lista estiver vazia, retorna "Nenhuma despesa encontrada."
-    
-    Exemplo de Saída:
-        ```
-        Despesa 1:
-        - Deputado: João Silva
-        - Fornecedor: Empresa ABC Ltda
-        - CNPJ: 12345678000190
-        - Descrição: Locação de veículos
-        - Valor: R$ 15000.00
-        - Data: 2024-03-15
-        
-        Despesa 2:
-        - Deputado: Maria Santos
-        - Fornecedor: Consultoria XYZ
-        - CNPJ: 98765432000110
-        - Descrição: Serviços de consultoria
-        - Valor: R$ 45000.00
-        - Data: 2024-02-20
-        ```
+        str: Resposta do modelo
     """
-    if not expenses:
-        return "Nenhuma despesa encontrada."
-    
-    context_parts = []
+    completion = await _get_async_openai_client().chat.completions.create(
+        model='gpt-4o-mini',
+        temperature=0.3,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return completion.choices[0].message.content
+
+
+def _complete_stream(prompt: str) -> Iterator[str]:
+    """
+    Versão de _complete que devolve a resposta em partes, à medida que o
+    modelo as gera.
     
-    for i, expense in enumerate(expenses, 1):
-        expense_text = f"Despesa {i}:\n"
-        expense_text += f"- Deputado: {expense.get('nome_deputado', 'N/A')}\n"
-        expense_text += f"- Fornecedor: {expense.get('nome_fornecedor', 'N/A')}\n"
-        expense_text += f"- CNPJ: {expense.get('cnpj_fornecedor', 'N/A')}\n"
-        expense_text += f"- Descrição: {expense.get('descricao_despesa', 'N/A')}\n"
-        expense_text += f"- Valor: R$ {expense.get('valor', 0):.2f}\n"
-        expense_text += f"- Data: {expense.get('data_despesa', 'N/A')}\n"
-        
-        # Adicionar informações extras se disponíveis (de buscas de padrões)
-        if 'num_transacoes' in expense:
-            expense_text += f"- Número de Transações: {expense.get('num_transacoes')}\n"
-        if 'total_pago' in expense:
-            expense_text += f"- Total Pago: R$ {expense.get('total_pago', 0):.2f}\n"
-        
-        context_parts.append(expense_text)
+    Args:
+        prompt (str): Prompt montado por _build_audit_prompt
     
-    return "\n".join(context_parts)
+    Yields:
+        str: Trechos não vazios da resposta, na ordem de geração
+    """
+    stream = _get_openai_client().chat.completions.create(
+        model='gpt-4o-mini',
+        temperature=0.3,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        # Consumidor que desiste no meio libera a conexão HTTP para o pool
+        stream.close()
 
 
-def _create_expense_id(expense):
+def _retrieve_expenses(user_question: str, search_strategies: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Cria um ID único para uma despesa baseado em seus campos principais.
-    
-    Usa hash SHA256 para garantir IDs consistentes e determinísticos.
+    Executa as buscas planejadas em paralelo e seleciona as despesas do contexto.
     
     Args:
-        expense: Dicionário contendo informações da despesa
+        user_question (str): Pergunta do cidadão
+        search_strategies (Optional[Dict[str, Any]]): Ver auditor_ai
     
     Returns:
-        str: ID único para a despesa
+        List[Dict[str, Any]]: Despesas que irão para o prompt (pode ser vazia)
+    
+    Raises:
+        ValueError: Se OPENAI_API_KEY não estiver configurada
     """
-    # Criar ID baseado em campos-chave para identificação única
-    id_parts = [
-        str(expense.get('nome_deputado', '')),
-        str(expense.get('cnpj_fornecedor', '')),
-        str(expense.get('valor', '')),
-        str(expense.get('data_despesa', ''))
+    # Validar API key do OpenAI
+    if not _OPENAI_API_KEY:
+        raise ValueError(
+            "Missing OPENAI_API_KEY environment variable. "
+            "Please set OPENAI_API_KEY to use the chat model."
+        )
+    
+    # Se nenhuma estratégia foi especificada, usar apenas busca semântica
+    if search_strategies is None:
+        search_strategies = {'semantic': True}
+    
+    searches = _plan_searches(user_question, search_strategies)
+    
+    # As buscas são independentes (I/O em bancos e APIs diferentes): executá-las
+    # em paralelo faz o tempo total ser o da mais lenta, e não a soma de todas
+    executor = _get_search_executor()
+    futures = [
+        (label, executor.submit(search_fn, *args, **kwargs))
+        for label, search_fn, args, kwargs in searches
     ]
-    # Usar hashlib.sha256 para criar um ID determinístico
-    id_string = '|'.join(id_parts)
-    return hashlib.sha256(id_string.encode('utf-8')).hexdigest()[:16]
+    
+    # Coletar na ordem de submissão para manter o RRF determinístico
+    outcomes = []
+    for label, future in futures:
+        try:
+            outcomes.append((label, future.result()))
+        except Exception as e:
+            outcomes.append((label, e))
+    
+    if RERANK_ENABLED:
+        return _rerank_expenses(
+            user_question, _fuse_search_results(outcomes, limit=RERANK_CANDIDATES)
+        )
+    return _fuse_search_results(outcomes)
 
 
 def auditor_ai(user_question: str, search_strategies: Optional[Dict[str, Any]] = None) -> str:
@@ -721,183 +2066,151 @@ def auditor_ai(user_question: str, search_strategies: Optional[Dict[str, Any]] =
     Performance:
     -----------
     - Tempo médio: 2-5 segundos (depende de chamadas à API OpenAI)
-    - Máximo de despesas analisadas: 15 (top do ranking RRF)
+    - Máximo de despesas analisadas: 15 (top do ranking RRF), ou 5 com
+      AUDITOR_RERANK=1 (reordenadas por um cross-encoder)
     - Geração de embeddings: ~0.1s por consulta
     """
-    # Validar API key do OpenAI
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not openai_api_key:
-        raise ValueError(
-            "Missing OPENAI_API_KEY environment variable. "
-            "Please set OPENAI_API_KEY to use the ChatOpenAI model."
-        )
-    
-    # Coletar resultados de diferentes buscas para aplicar RRF
-    search_result_lists = []
-    all_expenses_dict = {}  # Para armazenar os detalhes das despesas
-    
-    # Se nenhuma estratégia foi especificada, usar apenas busca semântica
-    if search_strategies is None:
-        search_strategies = {'semantic': True}
-    
-    # Busca Lexical por Deputado
-    if 'lexical_deputado' in search_strategies:
-        deputado_name = search_strategies['lexical_deputado']
-        try:
-            lexical_results = search_lexical(deputado_name, search_type="deputado", limit=10)
-            # Criar IDs únicos para cada despesa
-            result_ids = []
-            for expense in lexical_results:
-                expense_id = _create_expense_id(expense)
-                result_ids.append(expense_id)
-                all_expenses_dict[expense_id] = expense
-            search_result_lists.append(result_ids)
-        except Exception as e:
-            logger.warning(f"Lexical search by deputado failed: {e}")
+    final_expenses = _retrieve_expenses(user_question, search_strategies)
     
-    # Busca Lexical por CNPJ
-    if 'lexical_cnpj' in search_strategies:
-        cnpj = search_strategies['lexical_cnpj']
-        try:
-            cnpj_results = search_lexical(cnpj, search_type="cnpj", limit=10)
-            result_ids = []
-            for expense in cnpj_results:
-                expense_id = _create_expense_id(expense)
-                result_ids.append(expense_id)
-                all_expenses_dict[expense_id] = expense
-            search_result_lists.append(result_ids)
-        except Exception as e:
-            logger.warning(f"Lexical search by CNPJ failed: {e}")
+    # Se não encontrou nenhuma despesa
+    if not final_expenses:
+        return NO_EXPENSES_ANSWER
+    
+    # Mesma pergunta com a mesma evidência: reaproveitar a resposta
+    answer_key = _answer_key(user_question, final_expenses)
+    answer = _cached_answer(answer_key)
+    if answer is None:
+        # Gerar resposta final
+        answer = _complete(_build_audit_prompt(user_question, final_expenses))
+        _store_answer(answer_key, answer)
+    return answer
+
+
+def auditor_ai_stream(user_question: str, search_strategies: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Versão de auditor_ai que entrega a resposta em partes, conforme é gerada.
     
-    # Busca Semântica
-    if search_strategies.get('semantic'):
-        try:
-            semantic_results = search_semantic(user_question, limit=10)
-            result_ids = []
-            for expense in semantic_results:
-                expense_id = _create_expense_id(expense)
-                result_ids.append(expense_id)
-                all_expenses_dict[expense_id] = expense
-            search_result_lists.append(result_ids)
-        except Exception as e:
-            logger.warning(f"Semantic search failed: {e}")
+    As buscas e a fusão são as mesmas; só a chamada ao LLM muda. O primeiro
+    trecho chega após o processamento do prompt (centenas de ms), em vez de
+    só depois da resposta completa, e a interface pode exibi-lo de imediato.
+    Quem precisar do texto inteiro pode usar "".join(auditor_ai_stream(...)).
     
-    # Busca de Padrões no Grafo
-    if 'graph_patterns' in search_strategies:
-        pattern_config = search_strategies['graph_patterns']
-        try:
-            pattern_results = search_graph_patterns(
-                pattern_config.get('type'),
-                pattern_config.get('value'),
-                limit=10
-            )
-            result_ids = []
-            for expense in pattern_results:
-                expense_id = _create_expense_id(expense)
-                result_ids.append(expense_id)
-                all_expenses_dict[expense_id] = expense
-            search_result_lists.append(result_ids)
-        except Exception as e:
-            logger.warning(f"Graph pattern search failed: {e}")
+    Args:
+        user_question (str): Pergunta do cidadão
+        search_strategies (Optional[Dict[str, Any]]): Ver auditor_ai
     
-    # Aplicar Reciprocal Rank Fusion se houver múltiplos resultados
-    if len(search_result_lists) > 1:
-        # Usar RRF para combinar e rankear resultados
-        fused_df = reciprocal_rank_fusion(search_result_lists, k=60)
-        # Pegar os top resultados ranqueados
-        top_expense_ids = fused_df['despesa_id'].head(15).tolist()
-        # Recuperar as despesas correspondentes
-        final_expenses = [all_expenses_dict[exp_id] for exp_id in top_expense_ids if exp_id in all_expenses_dict]
-    elif len(search_result_lists) == 1:
-        # Se só temos uma busca, usar os resultados diretos (sem duplicatas)
-        unique_ids = list(dict.fromkeys(search_result_lists[0]))  # Preserva ordem
-        final_expenses = [all_expenses_dict[exp_id] for exp_id in unique_ids[:15]]
-    else:
-        # Nenhuma busca retornou resultados
-        final_expenses = []
+    Yields:
+        str: Trechos da resposta do Auditor, na ordem de geração
     
-    # Formatar contexto
-    context = format_expense_context(final_expenses)
+    Raises:
+        ValueError: Se OPENAI_API_KEY não estiver configurada
+    """
+    final_expenses = _retrieve_expenses(user_question, search_strategies)
     
-    # Se não encontrou nenhuma despesa
     if not final_expenses:
-        return ("Desculpe, não encontrei despesas parlamentares relevantes para sua pergunta. "
-                "Tente reformular sua pergunta ou verificar se os dados estão disponíveis no sistema.")
-    
-    # Criar System Prompt específico para Auditor Cidadão
-    system_prompt = """Você é um Auditor Cidadão Imparcial especializado em análise de despesas públicas. 
-
-Sua função é analisar despesas parlamentares de forma crítica e analítica, respondendo às perguntas dos cidadãos de maneira objetiva, clara e baseada em evidências.
-
-SEMPRE cite informações específicas dos dados:
-- Valores EXATOS das despesas (em R$)
-- Nomes COMPLETOS dos deputados envolvidos
-- Nomes e CNPJs das empresas/fornecedores
-- Datas ESPECÍFICAS das transações
-- Descrições DETALHADAS das despesas
-
-Como um auditor profissional, você deve:
-1. ANALISAR CRITICAMENTE os dados apresentados
-2. IDENTIFICAR padrões suspeitos ou incomuns, incluindo:
-   - Valores desproporcionalmente altos para serviços comuns ou genéricos
-   - Concentração de pagamentos: múltiplas transações para o mesmo fornecedor
-   - Descrições vagas ou genéricas combinadas com valores elevados
-   - Padrões temporais suspeitos (ex: gastos concentrados em períodos específicos)
-   - Fornecedores que recebem de múltiplos deputados
-   - Valores atípicos ou outliers em relação à média
-3. QUANTIFICAR sempre que possível (ex: "Total pago: R$ X", "Média de gastos: R$ Y")
-4. CONTEXTUALIZAR os gastos quando relevante
-5. Ser CÉTICO mas JUSTO - apontar tanto aspectos positivos quanto preocupantes
-
-IMPORTANTE: Base suas observações EXCLUSIVAMENTE nos dados fornecidos. Se não houver dados suficientes para uma conclusão, mencione isso explicitamente.
-
-Seja factual, objetivo e mantenha um tom profissional de análise forense financeira."""
+        yield NO_EXPENSES_ANSWER
+        return
+    
+    answer_key = _answer_key(user_question, final_expenses)
+    answer = _cached_answer(answer_key)
+    if answer is not None:
+        yield answer
+        return
+    
+    parts = []
+    for part in _complete_stream(_build_audit_prompt(user_question, final_expenses)):
+        parts.append(part)
+        yield part
+    # Só chega aqui se o consumidor leu a resposta inteira
+    _store_answer(answer_key, ''.join(parts))
 
-    # Criar template de prompt
-    prompt_template = PromptTemplate(
-        input_variables=["context", "question"],
-        template=f"""{system_prompt}
 
-Contexto das Despesas Parlamentares:
-{{context}}
+async def _run_search_async(search_fn, *args, **kwargs) -> List[Dict[str, Any]]:
+    """
+    Executa uma busca planejada por _plan_searches() sem bloquear o event loop.
+    
+    Buscas com versão nativa assíncrona (grafo) usam-na diretamente; as demais
+    rodam no mesmo pool de auditor_ai() (_get_search_executor), dimensionado
+    para as buscas, e não no executor padrão do loop, que é pequeno
+    (min(32, CPUs + 4) threads) e disputado com as outras chamadas to_thread.
+    """
+    if search_fn is search_graph_patterns:
+        return await search_graph_patterns_async(*args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_search_executor(), functools.partial(search_fn, *args, **kwargs)
+    )
 
-Pergunta do Cidadão:
-{{question}}
 
-Resposta do Auditor:"""
-    )
+async def auditor_ai_async(user_question: str, search_strategies: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Versão assíncrona de auditor_ai(), para uso em servidores asyncio (ex: FastAPI).
     
-    # Inicializar ChatOpenAI com gpt-4o-mini
-    llm = ChatOpenAI(
-        model='gpt-4o-mini',
-        temperature=0.3,  # Temperatura baixa para respostas mais objetivas
-        openai_api_key=openai_api_key
-    )
+    As buscas rodam concorrentemente com asyncio.gather. A busca em grafo usa o
+    driver assíncrono do Neo4j e a chamada ao LLM o cliente AsyncOpenAI; as
+    demais buscas rodam fora do event loop (no pool de threads), reaproveitando
+    os mesmos pools de conexão e caches da versão síncrona. O event loop fica livre para atender
+    outras requisições enquanto a pergunta é processada. Chame
+    close_async_resources() ao encerrar a aplicação.
+    
+    Args:
+        user_question (str): Pergunta do cidadão sobre despesas parlamentares
+        search_strategies (Optional[Dict[str, Any]]): Mesmas opções de auditor_ai()
+    
+    Returns:
+        str: Resposta gerada pelo Auditor AI
+    
+    Raises:
+        ValueError: Se OPENAI_API_KEY não estiver configurada
+    
+    Exemplo:
+        >>> resposta = asyncio.run(auditor_ai_async("Mostre gastos com aluguel de carros"))
+    """
+    if not _OPENAI_API_KEY:
+        raise ValueError(
+            "Missing OPENAI_API_KEY environment variable. "
+            "Please set OPENAI_API_KEY to use the chat model."
+        )
     
-    # Criar chain usando LangChain Expression Language (LCEL)
-    output_parser = StrOutputParser()
-    chain = prompt_template | llm | output_parser
+    if search_strategies is None:
+        search_strategies = {'semantic': True}
     
-    # Gerar e retornar resposta final
-    response = chain.invoke({
-        "context": context,
-        "question": user_question
-    })
+    searches = _plan_searches(user_question, search_strategies)
+    results = await asyncio.gather(
+        *(_run_search_async(search_fn, *args, **kwargs) for _, search_fn, args, kwargs in searches),
+        return_exceptions=True
+    )
+    outcomes = [(label, result) for (label, *_), result in zip(searches, results)]
+    if RERANK_ENABLED:
+        # O cross-encoder roda na CPU/GPU: fora do event loop
+        final_expenses = await asyncio.to_thread(
+            _rerank_expenses, user_question, _fuse_search_results(outcomes, limit=RERANK_CANDIDATES)
+        )
+    else:
+        final_expenses = _fuse_search_results(outcomes)
     
-    return response
+    if not final_expenses:
+        return NO_EXPENSES_ANSWER
+    
+    answer_key = _answer_key(user_question, final_expenses)
+    answer = _cached_answer(answer_key)
+    if answer is None:
+        answer = await _complete_async(_build_audit_prompt(user_question, final_expenses))
+        _store_answer(answer_key, answer)
+    return answer
 
 
 # Exemplo de uso
 if __name__ == "__main__":
-    load_dotenv()
+    # .env já foi carregado na importação (e as credenciais lidas)
     
-    # Exemplo 1: Busca simples semântica
+    # Exemplo 1: Busca simples semântica, com a resposta exibida conforme chega
     print("=== Exemplo 1: Busca Semântica ===")
     try:
-        resposta = auditor_ai(
+        for trecho in auditor_ai_stream(
             "Mostre gastos com aluguel de carros de luxo"
-        )
-        print(resposta)
+        ):
+            print(trecho, end="", flush=True)
+        print()
     except Exception as e:
         print(f"Erro: {e}")
     
@@ -39,8 +39,10 @@ Curso: Aprendizado de Máquina
 
 import requests
 import csv
+import functools
+import os
 import time
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Any
 from datetime import datetime
 
 
@@ -51,6 +53,21 @@ RETRY_DELAY = 2  # Segundos entre retentativas
 REQUEST_DELAY = 0.5  # Segundos entre requisições (previne rate limiting)
 
 
+@functools.lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """
+    Retorna a sessão HTTP compartilhada por todas as requisições à API.
+    
+    A sessão mantém a conexão keep-alive com o servidor da Câmara, então cada
+    requisição (uma por deputado) reaproveita a conexão TLS já aberta em vez
+    de refazer DNS, TCP e handshake.
+    
+    Returns:
+        requests.Session: Sessão criada na primeira chamada
+    """
+    return requests.Session()
+
+
 def fetch_deputies(limit: int = 50) -> List[Dict[str, Any]]:
     """
     Busca lista de deputados da API da Câmara dos Deputados.
@@ -93,7 +110,7 @@ def fetch_deputies(limit: int = 50) -> List[Dict[str, Any]]:
     for attempt in range(MAX_RETRIES):
         try:
             print(f"Fetching up to {limit} deputies... (Attempt {attempt + 1}/{MAX_RETRIES})")
-            response = requests.get(url, params=params, timeout=10)
+            response = _get_session().get(url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             deputies = data.get("dados", [])
@@ -146,7 +163,7 @@ def fetch_deputy_expenses(deputy_id, year=None):
     
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = _get_session().get(url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             expenses = data.get("dados", [])
@@ -200,6 +217,10 @@ def save_to_csv(data, filename="despesas_camara.csv"):
     """
     Save consolidated expense data to a CSV file.
     
+    The rows are written to a temporary file next to `filename`, which is
+    then renamed over it, so a reader never sees a partially written CSV
+    (e.g. when prepare_data_artifacts.py gives up on a slow ETL run).
+    
     Args:
         data: List of expense dictionaries
         filename: Output CSV filename (default: despesas_camara.csv)
@@ -213,19 +234,26 @@ def save_to_csv(data, filename="despesas_camara.csv"):
         "vlrLiquido", "txtFornecedor", "cnpjCpfFornecedor", "datEmissao"
     ]
     
+    temp_filename = f"{filename}.tmp"
     try:
-        with open(filename, "w", newline="", encoding="utf-8") as csvfile:
+        with open(temp_filename, "w", newline="", encoding="utf-8") as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             writer.writerows(data)
+        os.replace(temp_filename, filename)
         print(f"Successfully saved {len(data)} expense records to {filename}")
     except IOError as e:
         print(f"Error saving to CSV: {e}")
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
 
 
-def main():
+def main(output_file="despesas_camara.csv"):
     """
     Main ETL pipeline execution.
+    
+    Args:
+        output_file: Output CSV filename (default: despesas_camara.csv)
     """
     print("=" * 60)
     print("ETL Pipeline - Chamber of Deputies Expense Data")
@@ -266,7 +294,7 @@ def main():
     
     # Step 5: Save consolidated data to CSV
     print(f"\nTotal expenses collected: {len(all_expenses)}")
-    save_to_csv(all_expenses)
+    save_to_csv(all_expenses, output_file)
     
     print("\n" + "=" * 60)
     print("ETL Pipeline completed successfully!")
@@ -620,7 +620,7 @@ Demonstrar que o sistema utiliza IA para responder perguntas em linguagem natura
 
 **Tecnologias Demonstradas:**
 - OpenAI GPT-4o-mini (Large Language Model)
-- LangChain (Framework RAG)
+- Pipeline RAG próprio (SDK da OpenAI)
 - Busca híbrida (lexical + semântica + grafo)
 
 ---
@@ -734,7 +734,7 @@ Estas imagens podem ser utilizadas para:
 - 🗄️ Neo4j (banco de grafos)
 - 🔍 PostgreSQL + pgvector (busca vetorial)
 - 🤖 OpenAI GPT-4o-mini + embeddings
-- 🔗 LangChain (framework RAG)
+- 🔗 Pipeline RAG próprio (SDK da OpenAI)
 """
     
     readme_path = evidence_dir / "README_EVIDENCIAS.md"
@@ -11,8 +11,8 @@ Arquitetura de Dados:
 1. **PostgreSQL + pgvector**: Busca lexical e semântica
    - Tabela: despesas_parlamentares
    - Colunas textuais: nome_deputado, cnpj_fornecedor, descricao_despesa
-   - Coluna vetorial: descricao_embedding (1536 dimensões)
-   - Índice: HNSW para busca vetorial rápida
+   - Coluna vetorial: descricao_embedding (halfvec, 512 dimensões em FP16)
+   - Índice: HNSW (produto interno sobre vetores normalizados) para busca vetorial rápida
 
 2. **Neo4j**: Busca de padrões e relações
    - Nós: (:Deputado), (:Fornecedor)
@@ -32,12 +32,29 @@ Autor: Tavs Coelho - Universidade Federal de Goiás (UFG)
 Curso: Aprendizado de Máquina
 """
 
+import base64
+import hashlib
+import io
+import json
 import os
+import random
+import sqlite3
+import struct
+import threading
+import time
+from collections import deque
+from queue import Empty, Full, Queue
+from datetime import date
+from decimal import Decimal
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import psycopg2
-from typing import List, Dict, Any
+from psycopg2.pool import ThreadedConnectionPool
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from pgvector.psycopg2 import register_vector
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, NotificationMinimumSeverity
+import httpx
 import openai
 from tqdm import tqdm
 from dotenv import load_dotenv
@@ -45,96 +62,468 @@ from dotenv import load_dotenv
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# Credenciais lidas uma única vez, na importação, e usadas por todas as funções
+_OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+_NEO4J_URI = os.getenv("NEO4J_URI")
+_NEO4J_USER = os.getenv("NEO4J_USERNAME")
+_NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+_SUPABASE_URL = os.getenv("SUPABASE_URL")
+_SUPABASE_PORT = os.getenv("SUPABASE_PORT", "5432")
+_SUPABASE_DB = os.getenv("SUPABASE_DB", "postgres")
+_SUPABASE_USER = os.getenv("SUPABASE_USER")
+_SUPABASE_PASSWORD = os.getenv("SUPABASE_PASSWORD")
+_POSTGRES_HOST = os.getenv("POSTGRES_HOST")
+_POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
+_POSTGRES_DB = os.getenv("POSTGRES_DB", "despesas_db")
+_POSTGRES_USER = os.getenv("POSTGRES_USER")
+_POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+
 # Constantes de configuração
-EMBEDDING_DIMENSION = 1536  # Dimensão do modelo text-embedding-3-small da OpenAI
+EMBEDDING_MODEL = "text-embedding-3-small"  # Modelo de embeddings da OpenAI
+EMBEDDING_DIMENSION = 512  # Dimensões pedidas ao text-embedding-3-small (nativo: 1536; a API trunca e renormaliza)
 BATCH_SIZE = 1000  # Número de linhas para commit em lote no PostgreSQL
+POSTGRES_COPY_WORKERS = 4  # Conexões fazendo COPY em paralelo no PostgreSQL
+CSV_CHUNK_SIZE = 10_000  # Linhas lidas do CSV por vez (mantém o uso de memória constante)
+CSV_PREFETCH_CHUNKS = 2  # Chunks lidos e limpos à frente do que está sendo inserido
+CSV_PREFETCH_POLL = 0.5  # Segundos entre as verificações de parada da thread de leitura com a fila cheia
+NEO4J_BATCH_SIZE = 5000  # Linhas enviadas por transação (UNWIND) ao Neo4j
+NEO4J_MAX_CONNECTIONS = 20  # Tamanho do pool de conexões Bolt do driver Neo4j
+NEO4J_ACQUISITION_TIMEOUT = 60  # Espera máxima (segundos) por uma conexão livre do pool
+HNSW_M = 16  # Conexões por nó do grafo HNSW
+HNSW_EF_CONSTRUCTION = 64  # Tamanho da lista de candidatos na construção do índice HNSW
+MAINTENANCE_WORK_MEM = '2GB'  # Memória da sessão para construir o índice após a carga
+HNSW_BUILD_WORKERS = 7  # Processos paralelos do PostgreSQL na construção do HNSW (além do líder)
+EMBEDDING_BATCH_SIZE = 2048  # Descrições por requisição à API de embeddings (máximo aceito pela OpenAI)
+EMBEDDING_MIN_BATCH_SIZE = 256  # Menor lote ao dividir as descrições entre os workers
+EMBEDDING_MAX_TOKENS = 300_000  # Tokens somados de todas as entradas de uma requisição (limite da OpenAI)
+EMBEDDING_WORKERS = 20  # Requisições de embedding simultâneas durante a ingestão
+EMBEDDING_MAX_RETRIES = 6  # Tentativas por lote quando a OpenAI responde 429 (rate limit)
+EMBEDDING_PREFETCH = 2  # Chunks com embeddings em andamento à frente do que está sendo inserido
+EMBEDDING_CACHE_FILE = os.getenv("EMBEDDING_CACHE_FILE", "emb_cache.db")  # Cache local de embeddings entre execuções
+EMBEDDING_CACHE_LOOKUP_SIZE = 900  # Hashes por consulta ao cache (o SQLite limita os parâmetros de uma consulta, 999 em versões antigas)
+FORCE_INGEST = os.getenv("FORCE_INGEST", "") == "1"  # Recarrega o PostgreSQL mesmo se o CSV não mudou
+USE_BATCH_API = os.getenv("EMBEDDING_BATCH_API", "") == "1"  # Gera os embeddings novos pela Batch API (50% mais barata, até 24h)
+BATCH_API_POLL_INTERVAL = 60  # Segundos entre consultas ao status de um job da Batch API
+OPENAI_MAX_CONNECTIONS = 20  # Conexões HTTPS mantidas abertas com a API da OpenAI
+OPENAI_TIMEOUT = 60  # Timeout (segundos) das requisições à OpenAI
 
+# Colunas lidas do CSV: formato do ETL e formato alternativo aceito por canonicalize_df
+CSV_COLUMNS = {
+    'nome', 'deputado_nome',
+    'siglaPartido', 'deputado_partido',
+    'txtFornecedor', 'fornecedor_nome',
+    'cnpjCpfFornecedor', 'fornecedor_cnpj',
+    'vlrLiquido', 'valor',
+    'datEmissao', 'data',
+    'txtDescricao', 'descricao',
+}
 
-def get_postgres_connection():
+# Tipos das colunas do CSV: CNPJ como texto (preserva zeros à esquerda) e
+# colunas de baixa cardinalidade como category para reduzir memória por chunk
+CSV_DTYPES = {
+    'cnpjCpfFornecedor': 'string', 'fornecedor_cnpj': 'string',
+    'nome': 'category', 'deputado_nome': 'category',
+    'siglaPartido': 'category', 'deputado_partido': 'category',
+    'txtDescricao': 'category', 'descricao': 'category',
+}
+
+
+# Canonical columns copied to PostgreSQL (plus descricao_embedding), in COPY order
+# Column names match auditor_ai.py expectations
+POSTGRES_COLUMNS = [
+    'nome_deputado', 'cnpj_fornecedor', 'nome_fornecedor',
+    'descricao_despesa', 'valor', 'data_despesa'
+]
+
+# Binary COPY (one per BATCH_SIZE rows); see encode_copy_binary for the wire format
+POSTGRES_COPY_QUERY = f"""
+COPY despesas_parlamentares 
+({', '.join(POSTGRES_COLUMNS)}, descricao_embedding)
+FROM STDIN WITH (FORMAT BINARY)
+"""
+
+# Cabeçalho do formato binário do COPY: assinatura, flags e extensão do cabeçalho
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+COPY_BINARY_TRAILER = struct.pack('>h', -1)
+POSTGRES_EPOCH = date(2000, 1, 1)
+
+# Pontuação e espaços removidos do CNPJ/CPF (usado por sanitize_cnpj e sanitize_cnpj_series):
+# tabela de exclusão do str.translate, que limpa a string em uma única passada.
+# Os espaços são os mesmos de str.isspace (todos abaixo de U+3001). Também em
+# textos grandes o translate ganha da regex equivalente ([.\-/\s]): ~30x em
+# 10 MB, pois o texto só contém caracteres ASCII e a tabela é consultada direto
+_CNPJ_DELETE = str.maketrans('', '', './-' + ''.join(
+    char for char in map(chr, range(0x3001)) if char.isspace()
+))
+
+# Uniqueness constraints back MERGE with an index lookup instead of a label
+# scan; the relationship index serves the valor_alto query and the full-text
+# index the deputado name search (deputado_fornecedores) in auditor_ai.py
+NEO4J_SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT deputado_nome IF NOT EXISTS "
+    "FOR (d:Deputado) REQUIRE d.nome IS UNIQUE",
+    "CREATE CONSTRAINT fornecedor_cnpj IF NOT EXISTS "
+    "FOR (f:Fornecedor) REQUIRE f.cnpj IS UNIQUE",
+    "CREATE INDEX pagou_valor IF NOT EXISTS "
+    "FOR ()-[r:PAGOU]-() ON (r.valor)",
+    "CREATE FULLTEXT INDEX deputado_nome_fulltext IF NOT EXISTS "
+    "FOR (d:Deputado) ON EACH [d.nome]",
+]
+
+# Nó que registra qual CSV o grafo contém (ver mark_neo4j_loaded)
+NEO4J_INGEST_STATE = "despesas_camara"
+
+# Use MERGE to avoid duplicates
+# Uses parameterized queries ($rows) to prevent Cypher injection
+# UNWIND ships a whole batch of rows in one round-trip with one query plan
+NEO4J_INSERT_QUERY = """
+UNWIND $rows AS r
+MERGE (d:Deputado {nome: r.nome_deputado})
+SET d.partido = r.partido
+
+MERGE (f:Fornecedor {cnpj: r.cnpj_fornecedor})
+SET f.nome = r.nome_fornecedor
+
+CREATE (d)-[:PAGOU {
+    valor: r.valor,
+    data: r.data_despesa,
+    descricao: r.descricao_despesa
+}]->(f)
+"""
+
+# Remove as relações PAGOU de uma carga anterior, NEO4J_BATCH_SIZE por
+# transação (um único DELETE de todo o grafo poderia esgotar a memória do
+# servidor). Os nós são mantidos: a carga seguinte os reaproveita com MERGE
+NEO4J_CLEAR_QUERY = """
+MATCH ()-[r:PAGOU]->()
+WITH r LIMIT $limit
+DELETE r
+RETURN count(*) AS deleted
+"""
+
+
+def read_csv_chunks(csv_file: str, chunksize: int = CSV_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
     """
-    Create and return a PostgreSQL connection using environment variables.
+    Read the CSV file lazily in chunks of `chunksize` rows.
+    
+    Only the columns used by canonicalize_df are parsed, so peak memory is
+    bounded by a single chunk regardless of the CSV size. Each chunk is
+    yielded already canonicalized (final column names, clean values).
+    
+    Args:
+        csv_file: Path to the CSV file
+        chunksize: Number of rows per chunk
     
     Returns:
-        psycopg2 connection object
+        Iterator of canonical DataFrames
     """
-    # Try Supabase first, then fall back to standard PostgreSQL
-    supabase_url = os.getenv("SUPABASE_URL")
+    # The reader is a context manager: closing this generator early also
+    # closes the CSV file
+    with pd.read_csv(
+        csv_file,
+        chunksize=chunksize,
+        engine='c',
+        usecols=lambda column: column in CSV_COLUMNS,
+        dtype=CSV_DTYPES
+    ) as reader:
+        for chunk in reader:
+            yield canonicalize_df(chunk)
+
+
+def prefetch_chunks(chunks: Iterable[pd.DataFrame],
+                    depth: int = CSV_PREFETCH_CHUNKS) -> Iterator[pd.DataFrame]:
+    """
+    Produce chunks on a background thread, up to `depth` ahead of the consumer.
+    
+    CSV parsing and canonicalization of the next chunks overlap with the
+    consumer's embedding requests and database writes instead of running
+    between them. Errors raised by the producer are re-raised here.
     
-    if supabase_url:
+    If the consumer stops early (an insert raises, or the iterator is
+    closed), the producer notices within CSV_PREFETCH_POLL seconds, closes
+    `chunks` (and with it the CSV reader) and exits, instead of blocking on
+    the full queue with `depth` chunks in memory.
+    
+    Args:
+        chunks: Iterable of DataFrames (typically read_csv_chunks)
+        depth: Maximum number of chunks buffered ahead
+    
+    Returns:
+        Iterator over the same chunks, in order
+    """
+    queue: Queue = Queue(maxsize=depth)
+    stop = threading.Event()
+    
+    def offer(message) -> bool:
+        """Queue `message` unless the consumer has stopped; False if it has."""
+        while not stop.is_set():
+            try:
+                queue.put(message, timeout=CSV_PREFETCH_POLL)
+                return True
+            except Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            for chunk in chunks:
+                if not offer(('chunk', chunk)):
+                    return
+        except Exception as e:
+            offer(('error', e))
+        else:
+            offer(('done', None))
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+    
+    threading.Thread(target=produce, name="csv-prefetch", daemon=True).start()
+    try:
+        while True:
+            kind, item = queue.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise item
+            yield item
+    finally:
+        # Also runs on GeneratorExit: release the producer and the chunks it
+        # already buffered
+        stop.set()
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+
+
+def get_postgres_connection_params() -> Dict[str, Any]:
+    """
+    Build the psycopg2 connection arguments from environment variables.
+    
+    Returns:
+        Dict of keyword arguments for psycopg2.connect / connection pools
+    """
+    # Try Supabase first, then fall back to standard PostgreSQL
+    if _SUPABASE_URL:
         # Parse Supabase URL (format: https://xxxxx.supabase.co or db.xxxxx.supabase.co)
         # Extract host for database connection
-        host = supabase_url.replace("https://", "").replace("http://", "")
+        host = _SUPABASE_URL.replace("https://", "").replace("http://", "")
         # Supabase database connections typically use db.{project-ref}.supabase.co format
         if not host.startswith("db."):
             # Convert project URL to database URL
             project_ref = host.split('.')[0]
             host = f"db.{project_ref}.supabase.co"
         
-        conn = psycopg2.connect(
+        return dict(
             host=host,
-            port=os.getenv("SUPABASE_PORT", "5432"),
-            database=os.getenv("SUPABASE_DB", "postgres"),
-            user=os.getenv("SUPABASE_USER"),
-            password=os.getenv("SUPABASE_PASSWORD")
-        )
-    else:
-        # Standard PostgreSQL connection
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRES_HOST", "localhost"),
-            port=os.getenv("POSTGRES_PORT", "5432"),
-            database=os.getenv("POSTGRES_DB", "despesas_db"),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD")
+            port=_SUPABASE_PORT,
+            database=_SUPABASE_DB,
+            user=_SUPABASE_USER,
+            password=_SUPABASE_PASSWORD
         )
     
-    return conn
+    # Standard PostgreSQL connection
+    return dict(
+        host=_POSTGRES_HOST or "localhost",
+        port=_POSTGRES_PORT,
+        database=_POSTGRES_DB,
+        user=_POSTGRES_USER,
+        password=_POSTGRES_PASSWORD
+    )
+
+
+def get_postgres_connection():
+    """
+    Create and return a PostgreSQL connection using environment variables.
+    
+    Returns:
+        psycopg2 connection object
+    """
+    return psycopg2.connect(**get_postgres_connection_params())
 
 
 def get_neo4j_driver():
     """
     Create and return a Neo4j driver using environment variables.
     
+    The driver keeps a bounded connection pool and disables server
+    notifications, which are never read during the bulk load but would
+    otherwise be serialized with every result.
+    
     Returns:
         Neo4j driver object
     """
-    neo4j_uri = os.getenv("NEO4J_URI")
-    neo4j_username = os.getenv("NEO4J_USERNAME")
-    neo4j_password = os.getenv("NEO4J_PASSWORD")
-    
-    if not all([neo4j_uri, neo4j_username, neo4j_password]):
+    if not all([_NEO4J_URI, _NEO4J_USER, _NEO4J_PASSWORD]):
         raise ValueError(
             "Missing Neo4j environment variables. "
             "Please set NEO4J_URI, NEO4J_USERNAME, and NEO4J_PASSWORD"
         )
     
-    driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_username, neo4j_password))
+    driver = GraphDatabase.driver(
+        _NEO4J_URI,
+        auth=(_NEO4J_USER, _NEO4J_PASSWORD),
+        max_connection_pool_size=NEO4J_MAX_CONNECTIONS,
+        connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+        notifications_min_severity=NotificationMinimumSeverity.OFF
+    )
     return driver
 
 
-def generate_embedding(text, client):
+def create_openai_client(api_key: str) -> openai.OpenAI:
+    """
+    Create an OpenAI client backed by a pooled, keep-alive HTTP client.
+    
+    The same client should be shared by every caller (including worker
+    threads) so requests reuse open TLS connections instead of paying a new
+    handshake each time. HTTP/2 multiplexing is enabled when the optional
+    `h2` package is installed.
+    
+    Args:
+        api_key: OpenAI API key
+    
+    Returns:
+        openai.OpenAI client instance
+    """
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+        ),
+        http2=http2,
+        timeout=OPENAI_TIMEOUT
+    )
+    return openai.OpenAI(api_key=api_key, http_client=http_client)
+
+
+def has_description(df: pd.DataFrame) -> pd.Series:
     """
-    Generate embedding for text using OpenAI API.
+    Boolean mask of the rows whose descricao_despesa is non-empty.
+    
+    Rows outside the mask are stored with a zero embedding and never sent to
+    the OpenAI API.
+    
+    Args:
+        df: DataFrame chunk returned by canonicalize_df
+    
+    Returns:
+        pd.Series of bools aligned with df.index
+    """
+    return df['descricao_despesa'].str.strip().ne('')
+
+
+def split_embedding_batches(texts: List[str]) -> Iterator[List[str]]:
+    """
+    Split texts into API-sized batches for generate_embeddings_batch.
+    
+    Each batch holds at most EMBEDDING_BATCH_SIZE texts and at most
+    EMBEDDING_MAX_TOKENS tokens. Tokens are bounded by the UTF-8 byte length
+    (every BPE token covers at least one byte), so no tokenizer is needed.
+    
+    Large inputs are spread over up to EMBEDDING_WORKERS smaller batches
+    (never below EMBEDDING_MIN_BATCH_SIZE texts) so the requests run
+    concurrently instead of waiting on one big round-trip.
     
     Args:
-        text: Text to generate embedding for
+        texts: Texts to embed, in order
+    
+    Yields:
+        Consecutive slices of texts
+    """
+    batch_size = min(EMBEDDING_BATCH_SIZE,
+                     max(EMBEDDING_MIN_BATCH_SIZE, -(-len(texts) // EMBEDDING_WORKERS)))
+    batch: List[str] = []
+    tokens = 0
+    for text in texts:
+        size = len(text.encode('utf-8'))
+        if batch and (len(batch) == batch_size or tokens + size > EMBEDDING_MAX_TOKENS):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += size
+    if batch:
+        yield batch
+
+
+def generate_embeddings_batch(texts: List[str], client) -> np.ndarray:
+    """
+    Generate embeddings for a batch of texts with a single OpenAI API call.
+    
+    Vectors are requested base64-encoded and decoded straight into a float32
+    array; otherwise the SDK expands each one into a list of Python floats
+    that would only be packed back into numpy by the caller.
+    
+    Rate-limit errors (HTTP 429) are retried with exponential backoff and
+    jitter, so many concurrent workers can run right at the account quota.
+    Any other failure splits the batch in half and retries each half, so a
+    single offending text only costs its own embedding.
+    
+    Args:
+        texts: Texts to generate embeddings for (one batch from split_embedding_batches)
         client: OpenAI client instance
         
     Returns:
-        List of floats representing the embedding
+        float32 array of shape (len(texts), EMBEDDING_DIMENSION), rows in the
+        same order as texts
     """
-    if not text or pd.isna(text):
-        text = ""
+    if not texts:
+        return np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
     
-    try:
-        response = client.embeddings.create(
-            input=str(text),
-            model="text-embedding-3-small"
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        try:
+            response = client.embeddings.create(
+                input=texts,
+                model=EMBEDDING_MODEL,
+                dimensions=EMBEDDING_DIMENSION,
+                encoding_format="base64"
+            )
+            embeddings = np.empty((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+            for d in response.data:
+                embeddings[d.index] = np.frombuffer(base64.b64decode(d.embedding), dtype='<f4')
+            return embeddings
+        except openai.RateLimitError as e:
+            if attempt == EMBEDDING_MAX_RETRIES:
+                print(f"Error generating embeddings (rate limit): {e}")
+                return np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+            time.sleep(min(2 ** attempt, 60) + random.uniform(0, 1))
+        except Exception as e:
+            error = e
+            break
+    
+    if len(texts) == 1:
+        print(f"Error generating embedding: {error}")
         # Return a zero vector of the expected dimension
-        return [0.0] * EMBEDDING_DIMENSION
+        return np.zeros((1, EMBEDDING_DIMENSION), dtype=np.float32)
+    
+    middle = len(texts) // 2
+    return np.concatenate([generate_embeddings_batch(texts[:middle], client),
+                           generate_embeddings_batch(texts[middle:], client)])
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Scale each row of an (N, EMBEDDING_DIMENSION) array to unit length, in place.
+    
+    With unit vectors the inner product equals the cosine similarity, so the
+    HNSW index can use halfvec_ip_ops and skip the norm computation on every
+    comparison. Zero vectors (rows without description) are left untouched.
+    
+    Args:
+        embeddings: float32 array with one embedding per row
+    
+    Returns:
+        np.ndarray: The same array, normalized
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    embeddings /= norms
+    return embeddings
 
 
 def setup_postgresql_table(conn):
@@ -156,20 +545,25 @@ def setup_postgresql_table(conn):
     
     # Create table with text and embedding columns
     # CRITICAL: Column names must exactly match what auditor_ai.py queries expect:
-    # - nome_deputado (not deputado_nome) for lexical search by deputy name
+    # - nome_deputado (not deputado_nome) for lexical search by deputy name;
+    #   nome_deputado_lower keeps it lowercased once at write time so the
+    #   search never calls LOWER() per row
     # - cnpj_fornecedor for lexical search by CNPJ and graph pattern analysis
     # - descricao_despesa for semantic/vector search using pgvector
-    # - descricao_embedding (vector) for similarity search operations
+    # - descricao_embedding (halfvec) for similarity search operations; FP16
+    #   halves table and HNSW index size with negligible similarity loss
+    #   (requires pgvector 0.7+)
     cursor.execute(f"""
         CREATE TABLE despesas_parlamentares (
             id SERIAL PRIMARY KEY,
             nome_deputado TEXT,
+            nome_deputado_lower TEXT GENERATED ALWAYS AS (LOWER(nome_deputado)) STORED,
             cnpj_fornecedor TEXT,
             nome_fornecedor TEXT,
             descricao_despesa TEXT,
             valor NUMERIC,
             data_despesa DATE,
-            descricao_embedding vector({EMBEDDING_DIMENSION})
+            descricao_embedding halfvec({EMBEDDING_DIMENSION})
         );
     """)
     
@@ -178,20 +572,105 @@ def setup_postgresql_table(conn):
     print("Table created successfully.")
 
 
+def csv_fingerprint(csv_file: str, layout: str = f"halfvec({EMBEDDING_DIMENSION})") -> str:
+    """
+    Fingerprint of the CSV contents plus the layout it is loaded into.
+    
+    Args:
+        csv_file: Path to the CSV file
+        layout: Description of the target layout (defaults to the PostgreSQL
+            embedding column), so a layout change invalidates the fingerprint
+    
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256(f"{layout}|".encode())
+    with open(csv_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_loaded_fingerprint(conn) -> Optional[str]:
+    """
+    Fingerprint recorded by mark_loaded on the existing table, if any.
+    
+    Args:
+        conn: psycopg2 connection object
+    
+    Returns:
+        The stored fingerprint, or None if the table is missing or was not
+        fully loaded
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT obj_description(to_regclass('despesas_parlamentares'), 'pg_class');")
+    comment = cursor.fetchone()[0]
+    cursor.close()
+    if comment and comment.startswith('csv_sha256:'):
+        return comment[len('csv_sha256:'):]
+    return None
+
+
+def mark_loaded(conn, fingerprint: str):
+    """
+    Record on the table which CSV it holds, once the load and index are done.
+    
+    Args:
+        conn: psycopg2 connection object
+        fingerprint: Value returned by csv_fingerprint
+    """
+    cursor = conn.cursor()
+    cursor.execute("COMMENT ON TABLE despesas_parlamentares IS %s;", (f"csv_sha256:{fingerprint}",))
+    conn.commit()
+    cursor.close()
+
+
+def configure_bulk_load(conn):
+    """
+    Tune the session for the bulk load that follows.
+    
+    Commits no longer wait for the WAL flush (a crash mid-load only loses
+    the last batches, and the load is re-run from scratch anyway).
+    
+    Args:
+        conn: psycopg2 connection object
+    """
+    cursor = conn.cursor()
+    cursor.execute("SET synchronous_commit = OFF;")
+    conn.commit()
+    cursor.close()
+
+
 def create_hnsw_index(conn):
     """
     Create HNSW index for fast vector similarity search.
     
+    Must run after all rows are inserted and committed: building the graph
+    once over the loaded table is much cheaper than maintaining it row by row.
+    The build is split across up to HNSW_BUILD_WORKERS parallel workers
+    (pgvector >= 0.6; the server may grant fewer, see max_worker_processes).
+    
     Args:
         conn: psycopg2 connection object
     """
     cursor = conn.cursor()
     
+    # Refresh planner statistics for the freshly loaded table
+    print("Analyzing despesas_parlamentares...")
+    cursor.execute("ANALYZE despesas_parlamentares;")
+    
     print("Creating HNSW index for vector search...")
-    cursor.execute("""
+    # Set on the connection that builds the index: enough memory to
+    # construct the graph in RAM, split across the parallel workers
+    cursor.execute(f"SET maintenance_work_mem = '{MAINTENANCE_WORK_MEM}';")
+    cursor.execute(f"SET max_parallel_maintenance_workers = {HNSW_BUILD_WORKERS};")
+    # Embeddings are stored normalized (see normalize_embeddings), so inner
+    # product ranks exactly like cosine distance at a lower cost
+    cursor.execute(f"""
         CREATE INDEX IF NOT EXISTS despesas_parlamentares_embedding_idx 
         ON despesas_parlamentares 
-        USING hnsw (descricao_embedding vector_cosine_ops);
+        USING hnsw (descricao_embedding halfvec_ip_ops)
+        WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});
     """)
     
     conn.commit()
@@ -199,6 +678,49 @@ def create_hnsw_index(conn):
     print("HNSW index created successfully.")
 
 
+def create_lexical_indexes(conn):
+    """
+    Create the indexes behind auditor_ai.search_lexical.
+    
+    - A trigram GIN index on nome_deputado_lower serves the case-insensitive
+      `LIKE '%nome%'` search, which otherwise scans the whole table
+      (requires the pg_trgm extension, available on Supabase). Tables
+      created before that generated column existed get it added here.
+    - A B-tree on (cnpj_fornecedor, data_despesa DESC) serves the CNPJ
+      search and its ORDER BY data_despesa DESC LIMIT without a sort.
+    
+    Like the HNSW index, they are built once after the load. IF NOT EXISTS
+    keeps it cheap to call again on a table that already has them.
+    
+    Args:
+        conn: psycopg2 connection object
+    """
+    cursor = conn.cursor()
+    
+    print("Creating lexical search indexes...")
+    cursor.execute("""
+        ALTER TABLE despesas_parlamentares
+        ADD COLUMN IF NOT EXISTS nome_deputado_lower TEXT
+        GENERATED ALWAYS AS (LOWER(nome_deputado)) STORED;
+    """)
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    # Superseded by the index on the stored column below
+    cursor.execute("DROP INDEX IF EXISTS despesas_parlamentares_nome_trgm_idx;")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS despesas_parlamentares_nome_lower_trgm_idx
+        ON despesas_parlamentares
+        USING gin (nome_deputado_lower gin_trgm_ops);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS despesas_parlamentares_cnpj_data_idx
+        ON despesas_parlamentares (cnpj_fornecedor, data_despesa DESC);
+    """)
+    
+    conn.commit()
+    cursor.close()
+    print("Lexical indexes created successfully.")
+
+
 def sanitize_cnpj(cnpj_str: Optional[str]) -> str:
     """
     Sanitiza CNPJ removendo pontuação e espaços.
@@ -225,9 +747,39 @@ def sanitize_cnpj(cnpj_str: Optional[str]) -> str:
         >>> sanitize_cnpj(None)
         ''
     """
+    # Caso comum (str) primeiro, sem passar por pd.isna; '' continua ''
+    if type(cnpj_str) is str:
+        return cnpj_str.translate(_CNPJ_DELETE)
+    # Nulos mais comuns por identidade; pd.isna fica para os demais tipos
+    if cnpj_str is None or cnpj_str is pd.NA:
+        return ""
     if pd.isna(cnpj_str) or not cnpj_str:
         return ""
-    return str(cnpj_str).replace('.', '').replace('-', '').replace('/', '').strip()
+    return str(cnpj_str).translate(_CNPJ_DELETE)
+
+
+def sanitize_cnpj_series(cnpjs: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de sanitize_cnpj para uma coluna inteira.
+    
+    Limpa todos os valores em uma única operação do pandas, em vez de chamar
+    sanitize_cnpj linha a linha com .apply.
+    
+    Args:
+        cnpjs: Série com CNPJs/CPFs com ou sem formatação (pode conter nulos)
+    
+    Returns:
+        pd.Series: CNPJs sanitizados (dtype object), com '' nos valores nulos
+    
+    Exemplos:
+        >>> sanitize_cnpj_series(pd.Series(["12.345.678/0001-90", None])).tolist()
+        ['12345678000190', '']
+    """
+    return (
+        cnpjs.astype('string').fillna('')
+        .str.translate(_CNPJ_DELETE)
+        .astype(object)
+    )
 
 
 def convert_valor(valor_str):
@@ -242,6 +794,13 @@ def convert_valor(valor_str):
     Returns:
         float: Converted value
     """
+    # Plain floats and ints first, without going through pd.isna (NaN is the
+    # only float not equal to itself)
+    if type(valor_str) is float:
+        return valor_str if valor_str == valor_str else 0.0
+    if type(valor_str) is int:
+        return float(valor_str)
+    
     if pd.isna(valor_str):
         return 0.0
     
@@ -260,129 +819,773 @@ def convert_valor(valor_str):
         return 0.0
 
 
-def map_csv_columns(row):
+def convert_valor_series(valores: pd.Series) -> pd.Series:
     """
-    Map CSV columns from ETL output to database column names.
+    Vectorized convert_valor for a whole column.
+    
+    Numeric columns are only cast; text columns are cleaned with pandas
+    string operations and parsed by pd.to_numeric in one pass each, instead
+    of calling convert_valor row by row.
+    
+    Args:
+        valores: Series of values as strings or numbers (may contain nulls)
+    
+    Returns:
+        pd.Series: float values, 0.0 where missing or unparseable
+    """
+    if not pd.api.types.is_numeric_dtype(valores):
+        valores = pd.to_numeric(
+            valores.astype('string')
+                   .str.replace('R$', '', regex=False)
+                   .str.replace(' ', '', regex=False)
+                   .str.replace(',', '.', regex=False),
+            errors='coerce'
+        )
+    return valores.astype(float).fillna(0.0)
+
+
+def canonicalize_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Map a CSV chunk to the canonical columns consumed by both sinks, vectorized.
     
     ETL produces columns: nome, siglaPartido, txtFornecedor, cnpjCpfFornecedor, vlrLiquido, datEmissao, txtDescricao
-    Database expects: deputado_nome, fornecedor_nome, fornecedor_cnpj, valor, data, descricao
+    Alternative format: deputado_nome, deputado_partido, fornecedor_nome, fornecedor_cnpj, valor, data, descricao
+    Canonical columns: nome_deputado, cnpj_fornecedor, nome_fornecedor, descricao_despesa, valor, data_despesa, partido
+    
+    The canonical names are the despesas_parlamentares column names (plus
+    partido, used only by Neo4j), so the PostgreSQL rows and the Neo4j
+    UNWIND parameters are taken straight from the frame. Cleaning uses
+    sanitize_cnpj_series and convert_valor_series, which match sanitize_cnpj
+    and convert_valor but run on whole columns instead of row by row.
+    
+    Args:
+        df: DataFrame chunk with either ETL format or alternative format columns
+    
+    Returns:
+        pd.DataFrame: Canonical chunk, where cnpj_fornecedor and
+        descricao_despesa are strings ('' when missing), valor is float,
+        data_despesa is a datetime.date and missing names / dates are None
+    """
+    def column(etl_name: str, db_name: str) -> pd.Series:
+        if etl_name in df.columns:
+            return df[etl_name]
+        if db_name in df.columns:
+            return df[db_name]
+        return pd.Series(None, index=df.index, dtype='string')
+    
+    def nullable_text(series: pd.Series) -> pd.Series:
+        return series.astype(object).where(series.notna(), None)
+    
+    data = pd.to_datetime(column('datEmissao', 'data'), errors='coerce', format='ISO8601')
+    
+    return pd.DataFrame({
+        'nome_deputado': nullable_text(column('nome', 'deputado_nome')),
+        'cnpj_fornecedor': sanitize_cnpj_series(column('cnpjCpfFornecedor', 'fornecedor_cnpj')),
+        'nome_fornecedor': nullable_text(column('txtFornecedor', 'fornecedor_nome')),
+        'descricao_despesa': column('txtDescricao', 'descricao').astype('string').fillna('').astype(object),
+        'valor': convert_valor_series(column('vlrLiquido', 'valor')),
+        'data_despesa': data.dt.date.astype(object).where(data.notna(), None),
+        'partido': nullable_text(column('siglaPartido', 'deputado_partido')),
+    }, index=df.index)
+
+
+def _numeric_binary(value: float) -> Optional[bytes]:
+    """
+    Encode a float as PostgreSQL NUMERIC in binary wire format.
+    
+    NUMERIC is sent as base-10000 digits: int16 ndigits, int16 weight of the
+    first digit, uint16 sign, uint16 display scale, then the digits.
+    
+    Args:
+        value: Finite float (uses its shortest repr, e.g. 1500.5)
+    
+    Returns:
+        bytes, or None for NaN/infinite values (stored as NULL)
+    """
+    number = Decimal(repr(float(value)))
+    if not number.is_finite():
+        return None
+    
+    sign, digits, exponent = number.as_tuple()
+    text = ''.join(map(str, digits))
+    integer_digits = len(text) + exponent
+    if integer_digits < 0:
+        text = '0' * -integer_digits + text
+        integer_digits = 0
+    if len(text) < integer_digits:
+        text += '0' * (integer_digits - len(text))
+    
+    # Align to groups of 4 decimal digits around the decimal point
+    pad_left = -integer_digits % 4
+    text = '0' * pad_left + text
+    text += '0' * (-len(text) % 4)
+    groups = [int(text[i:i + 4]) for i in range(0, len(text), 4)]
+    weight = (integer_digits + pad_left) // 4 - 1
+    
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    
+    return struct.pack(
+        f'>hhHH{len(groups)}H',
+        len(groups), weight, 0x4000 if sign else 0, max(0, -exponent), *groups
+    )
+
+
+def halfvec_bytes(embedding) -> bytes:
+    """
+    Encode an embedding as the big-endian float16 values of a halfvec.
+    
+    Args:
+        embedding: Sequence or array of floats
+    
+    Returns:
+        bytes: 2 bytes per dimension
+    """
+    return np.asarray(embedding, dtype='>f2').tobytes()
+
+
+def encode_copy_binary(rows: List[tuple]) -> io.BytesIO:
+    """
+    Encode despesas rows in PostgreSQL COPY BINARY format.
     
-    This function supports both formats to maintain compatibility.
+    Each row is (nome_deputado, cnpj_fornecedor, nome_fornecedor,
+    descricao_despesa, valor, data_despesa, embedding) as produced by
+    insert_into_postgresql. Embeddings go out in pgvector's halfvec binary
+    layout (uint16 dim, uint16 unused, big-endian float16 values), so the
+    server skips parsing ~25 KB of ASCII floats per row. The embedding may
+    be given already encoded as big-endian float16 bytes (see
+    halfvec_bytes), which are written as-is.
     
     Args:
-        row: DataFrame row with either ETL format or database format columns
+        rows: Row tuples in POSTGRES_COPY_QUERY column order
     
     Returns:
-        dict: Mapped column values
+        io.BytesIO positioned at the start, ready for copy_expert
+    """
+    buffer = io.BytesIO()
+    write = buffer.write
+    write(COPY_BINARY_HEADER)
+    null = struct.pack('>i', -1)
+    
+    for nome, cnpj, fornecedor, descricao, valor, data, embedding in rows:
+        write(struct.pack('>h', 7))
+        for text_value in (nome, cnpj, fornecedor, descricao):
+            if text_value is None:
+                write(null)
+            else:
+                encoded = str(text_value).encode('utf-8')
+                write(struct.pack('>i', len(encoded)))
+                write(encoded)
+        
+        numeric = _numeric_binary(valor)
+        if numeric is None:
+            write(null)
+        else:
+            write(struct.pack('>i', len(numeric)))
+            write(numeric)
+        
+        if data is None:
+            write(null)
+        else:
+            write(struct.pack('>ii', 4, (data - POSTGRES_EPOCH).days))
+        
+        if not isinstance(embedding, bytes):
+            embedding = halfvec_bytes(embedding)
+        write(struct.pack('>iHH', 4 + len(embedding), len(embedding) // 2, 0))
+        write(embedding)
+    
+    write(COPY_BINARY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of OpenAI embeddings (SQLite).
+    
+    Keys are 16-byte BLAKE2b digests of the text (salted with EMBEDDING_MODEL
+    and EMBEDDING_DIMENSION, so vectors of another model or size are never
+    returned) and values the vector as float16 bytes, so re-running the
+    ingest only pays for descriptions that were never embedded before.
+    float16 halves the file and the SQLite I/O; the PostgreSQL column is
+    halfvec anyway, so no precision the table keeps is lost. Safe to share
+    between worker threads.
+    """
+    
+    def __init__(self, path: str = EMBEDDING_CACHE_FILE):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB)"
+            )
+            self.conn.commit()
+    
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(
+            f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSION}:{text}".encode('utf-8'), digest_size=16
+        ).digest()
+    
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached float16 embeddings for `texts`, keyed by text (misses omitted)."""
+        by_key = {self.key(text): text for text in texts}
+        keys = list(by_key)
+        rows = []
+        with self.lock:
+            for start in range(0, len(keys), EMBEDDING_CACHE_LOOKUP_SIZE):
+                batch = keys[start:start + EMBEDDING_CACHE_LOOKUP_SIZE]
+                rows += self.conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+        return {by_key[key]: np.frombuffer(vec, dtype=np.float16) for key, vec in rows}
+    
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Store embeddings; zero vectors (failed requests) are not cached."""
+        rows = [
+            (self.key(text), np.asarray(vector, dtype=np.float16).tobytes())
+            for text, vector in zip(texts, vectors)
+            if np.any(vector)
+        ]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)", rows
+            )
+            self.conn.commit()
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _embed_normalized(texts: List[str], client,
+                      cache: Optional[EmbeddingCache] = None) -> Tuple[np.ndarray, float]:
     """
-    return {
-        'deputado_nome': row.get('nome', row.get('deputado_nome', '')),
-        'fornecedor_nome': row.get('txtFornecedor', row.get('fornecedor_nome', '')),
-        'fornecedor_cnpj': sanitize_cnpj(row.get('cnpjCpfFornecedor', row.get('fornecedor_cnpj', ''))),
-        'valor': convert_valor(row.get('vlrLiquido', row.get('valor', 0))),
-        'data': row.get('datEmissao', row.get('data', None)),
-        'descricao': row.get('txtDescricao', '')
-    }
+    Worker task: embed one batch of descriptions and normalize the vectors.
+    
+    Descriptions found in `cache` skip the API call; new embeddings are
+    added to it.
+    
+    Args:
+        texts: Descriptions to embed (one batch from split_embedding_batches)
+        client: OpenAI client instance
+        cache: Optional EmbeddingCache
+    
+    Returns:
+        Tuple with the (len(texts), EMBEDDING_DIMENSION) array and the request
+        latency in seconds
+    """
+    started = time.perf_counter()
+    cached = cache.get_many(texts) if cache else {}
+    misses = [text for text in texts if text not in cached]
+    
+    fetched = generate_embeddings_batch(misses, client)
+    if cache and misses:
+        cache.put_many(misses, fetched)
+    cached.update(zip(misses, fetched))
+    
+    vectors = np.stack([cached[text] for text in texts]).astype(np.float32)
+    return normalize_embeddings(vectors), time.perf_counter() - started
+
+
+def prefill_cache_with_batch_api(csv_file: str, client, cache: EmbeddingCache) -> int:
+    """
+    Embed every uncached description of the CSV through the OpenAI Batch API.
+    
+    The Batch API costs half as much as the regular endpoint and does not
+    count against its rate limits, in exchange for completing asynchronously
+    (up to 24h). The initial load is not latency-sensitive, so the results
+    are written straight into `cache` and insert_into_postgresql then finds
+    every description there. Descriptions the job fails to embed are simply
+    left out of the cache and go through the regular endpoint later.
+    
+    Args:
+        csv_file: Path to the CSV file
+        client: OpenAI client instance
+        cache: EmbeddingCache that receives the new embeddings
+    
+    Returns:
+        int: Number of descriptions embedded by the batch job
+    """
+    descriptions: Dict[str, None] = {}
+    for df in read_csv_chunks(csv_file):
+        descriptions.update(dict.fromkeys(df['descricao_despesa'][has_description(df)]))
+    texts = list(descriptions)
+    cached = cache.get_many(texts) if texts else {}
+    missing = [text for text in texts if text not in cached]
+    if not missing:
+        return 0
+    
+    # One request per API-sized batch; custom_id points back to the batch
+    batches = list(split_embedding_batches(missing))
+    requests = io.BytesIO()
+    for i, batch in enumerate(batches):
+        line = {
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/embeddings",
+            "body": {
+                "model": EMBEDDING_MODEL,
+                "input": batch,
+                "dimensions": EMBEDDING_DIMENSION
+            }
+        }
+        requests.write(json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n')
+    
+    input_file = client.files.create(
+        file=("embeddings.jsonl", requests.getvalue()),
+        purpose="batch"
+    )
+    job = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/embeddings",
+        completion_window="24h"
+    )
+    print(f"Submitted Batch API job {job.id} with {len(missing)} descriptions "
+          f"in {len(batches)} requests; waiting for it to finish...")
+    
+    while job.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(BATCH_API_POLL_INTERVAL)
+        job = client.batches.retrieve(job.id)
+    
+    if job.status != "completed" or not job.output_file_id:
+        print(f"Batch API job {job.id} ended with status '{job.status}'; "
+              f"falling back to the regular embeddings endpoint")
+        return 0
+    
+    embedded = 0
+    for line in client.files.content(job.output_file_id).text.splitlines():
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            continue
+        batch = batches[int(result["custom_id"])]
+        data = sorted(response["body"]["data"], key=lambda d: d["index"])
+        cache.put_many(batch, np.asarray([d["embedding"] for d in data], dtype=np.float32))
+        embedded += len(batch)
+    
+    print(f"✓ Batch API job {job.id} embedded {embedded} of {len(missing)} descriptions")
+    return embedded
+
+
+def _copy_rows(pool: ThreadedConnectionPool, rows: List[tuple]):
+    """
+    Worker task: binary COPY one batch of rows on a pooled connection.
+    
+    Args:
+        pool: Connection pool shared by the COPY workers
+        rows: Tuples in POSTGRES_COLUMNS order followed by the embedding
+    """
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.copy_expert(POSTGRES_COPY_QUERY, encode_copy_binary(rows))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
 
 
-def insert_into_postgresql(df, conn, openai_client):
+def insert_into_postgresql(chunks: Iterable[pd.DataFrame], pool: ThreadedConnectionPool,
+                           openai_client, embedding_cache: Optional[EmbeddingCache] = None) -> int:
     """
     Insert data into PostgreSQL with embeddings.
     
+    txtDescricao is a small closed set of categories, so each distinct
+    description is embedded once and reused for every row (and chunk) that
+    repeats it.
+    
+    Embedding requests run on a thread pool: while one chunk is written to
+    PostgreSQL, the embeddings of the next EMBEDDING_PREFETCH chunks are
+    already in flight, overlapping OpenAI latency with database writes.
+    
+    Each BATCH_SIZE slice is loaded by its own COPY on one of
+    POSTGRES_COPY_WORKERS pooled connections, so several COPY streams share
+    the network link to the server.
+    
     Args:
-        df: Pandas DataFrame with despesas data
-        conn: psycopg2 connection object
+        chunks: Iterable of Pandas DataFrames with despesas data (see read_csv_chunks)
+        pool: Connection pool with at least POSTGRES_COPY_WORKERS connections
         openai_client: OpenAI client instance
+        embedding_cache: Optional EmbeddingCache reused across runs
+    
+    Returns:
+        int: Number of rows inserted
     """
-    cursor = conn.cursor()
+    inserted = 0
     
-    print("\nInserting data into PostgreSQL...")
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="PostgreSQL"):
-        # Map columns from CSV format to database format
-        mapped = map_csv_columns(row)
+    # Embedding per distinct description, shared across chunks and kept
+    # already encoded for COPY (halfvec_bytes: half the memory of float32,
+    # converted once instead of once per row), and the (future, row) that
+    # will produce the ones still in flight
+    emb_map: Dict[str, bytes] = {}
+    zero_embedding = halfvec_bytes(np.zeros(EMBEDDING_DIMENSION, dtype=np.float32))
+    in_flight: Dict[str, Tuple[Future, int]] = {}
+    latencies: List[float] = []
+    copies: deque = deque()
+    
+    def schedule(df: pd.DataFrame, executor: ThreadPoolExecutor):
+        # Submit embeddings only for descriptions not seen before; empty
+        # descriptions keep a zero vector without an API call
+        positions = np.flatnonzero(has_description(df).to_numpy())
+        texts = df['descricao_despesa'].to_numpy()[positions].tolist()
+        new_texts = [t for t in dict.fromkeys(texts) if t not in emb_map and t not in in_flight]
+        for batch in split_embedding_batches(new_texts):
+            future = executor.submit(_embed_normalized, batch, openai_client, embedding_cache)
+            for i, text in enumerate(batch):
+                in_flight[text] = (future, i)
+        return df, positions, texts
+    
+    def write(df: pd.DataFrame, positions: np.ndarray, texts: List[str],
+              copy_executor: ThreadPoolExecutor) -> int:
+        embeddings = [zero_embedding] * len(df)
+        for i, description in zip(positions, texts):
+            if description not in emb_map:
+                future, row = in_flight.pop(description)
+                vectors, latency = future.result()
+                if row == 0:
+                    latencies.append(latency)
+                emb_map[description] = halfvec_bytes(vectors[row])
+            embeddings[i] = emb_map[description]
         
-        # Generate embedding for description
-        embedding = generate_embedding(mapped['descricao'], openai_client)
+        rows = [
+            (*values, embedding)
+            for values, embedding in zip(df[POSTGRES_COLUMNS].itertuples(index=False, name=None), embeddings)
+        ]
         
-        # Insert data with column names matching auditor_ai.py expectations
-        cursor.execute("""
-            INSERT INTO despesas_parlamentares 
-            (nome_deputado, cnpj_fornecedor, nome_fornecedor, 
-             descricao_despesa, valor, data_despesa, descricao_embedding)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (
-            mapped['deputado_nome'],
-            mapped['fornecedor_cnpj'],
-            mapped['fornecedor_nome'],
-            mapped['descricao'],
-            mapped['valor'],
-            mapped['data'],
-            embedding
-        ))
+        # One binary COPY and commit per BATCH_SIZE rows, spread over the
+        # pool; at most two rounds of COPYs are queued ahead of the workers
+        for start in range(0, len(rows), BATCH_SIZE):
+            copies.append(copy_executor.submit(_copy_rows, pool, rows[start:start + BATCH_SIZE]))
+            while len(copies) > 2 * POSTGRES_COPY_WORKERS:
+                copies.popleft().result()
         
-        # Commit every BATCH_SIZE rows for efficiency
-        if (idx + 1) % BATCH_SIZE == 0:
-            conn.commit()
+        progress.update(len(df))
+        return len(rows)
     
-    # Final commit
-    conn.commit()
-    cursor.close()
+    print("\nInserting data into PostgreSQL...")
+    progress = tqdm(desc="PostgreSQL", unit="rows")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor, \
+            ThreadPoolExecutor(max_workers=POSTGRES_COPY_WORKERS) as copy_executor:
+        pending = deque()
+        for df in chunks:
+            pending.append(schedule(df, executor))
+            if len(pending) > EMBEDDING_PREFETCH:
+                inserted += write(*pending.popleft(), copy_executor)
+        while pending:
+            inserted += write(*pending.popleft(), copy_executor)
+        while copies:
+            copies.popleft().result()
+    
+    progress.close()
+    if latencies:
+        print(f"Embedding requests: {len(latencies)}, "
+              f"avg latency {sum(latencies) / len(latencies):.2f}s, "
+              f"total request time {sum(latencies):.1f}s "
+              f"(wall clock {time.perf_counter() - started:.1f}s)")
     print("PostgreSQL data insertion completed.")
+    return inserted
+
+
+def _write_neo4j_rows(tx, rows: List[Dict[str, Any]]):
+    """
+    Write a batch of despesas inside a single managed Neo4j transaction.
+    
+    Args:
+        tx: Neo4j managed transaction
+        rows: Query parameters, one dict per despesa
+    """
+    tx.run(NEO4J_INSERT_QUERY, rows=rows)
+
+
+def _delete_neo4j_relationships(tx, limit: int) -> int:
+    """Delete up to `limit` PAGOU relationships; returns how many were deleted."""
+    return tx.run(NEO4J_CLEAR_QUERY, limit=limit).single()["deleted"]
+
+
+def clear_neo4j_relationships(session) -> int:
+    """
+    Delete every PAGOU relationship, NEO4J_BATCH_SIZE per transaction.
+    
+    PAGOU relations are CREATEd by NEO4J_INSERT_QUERY, so a reload on top
+    of an existing graph would duplicate them. Deputado and Fornecedor
+    nodes are kept; the load MERGEs onto them.
+    
+    Args:
+        session: Neo4j session
+    
+    Returns:
+        int: Number of relationships deleted
+    """
+    total = 0
+    while True:
+        deleted = session.execute_write(_delete_neo4j_relationships, NEO4J_BATCH_SIZE)
+        total += deleted
+        if deleted < NEO4J_BATCH_SIZE:
+            return total
+
+
+def setup_neo4j_schema(session):
+    """
+    Create the Neo4j constraints and indexes used by the ingest and queries.
+    
+    Must run before the bulk load so every MERGE is an index lookup.
+    
+    Args:
+        session: Neo4j session
+    """
+    print("Creating Neo4j constraints and indexes...")
+    for query in NEO4J_SCHEMA_QUERIES:
+        session.run(query).consume()
+
+
+def get_neo4j_loaded_fingerprint(session) -> Optional[str]:
+    """
+    Fingerprint recorded by mark_neo4j_loaded, if the graph was fully loaded.
+    
+    Args:
+        session: Neo4j session
+    
+    Returns:
+        The stored fingerprint, or None
+    """
+    record = session.run(
+        "MATCH (s:IngestState {name: $name}) RETURN s.csv_sha256 AS fingerprint",
+        name=NEO4J_INGEST_STATE
+    ).single()
+    return record["fingerprint"] if record else None
+
+
+def mark_neo4j_loaded(session, fingerprint: Optional[str]):
+    """
+    Record which CSV the graph holds; None clears it before a new load.
+    
+    Args:
+        session: Neo4j session
+        fingerprint: Value returned by csv_fingerprint, or None
+    """
+    if fingerprint is None:
+        session.run(
+            "MATCH (s:IngestState {name: $name}) DELETE s", name=NEO4J_INGEST_STATE
+        ).consume()
+    else:
+        session.run(
+            "MERGE (s:IngestState {name: $name}) SET s.csv_sha256 = $fingerprint",
+            name=NEO4J_INGEST_STATE, fingerprint=fingerprint
+        ).consume()
 
 
-def insert_into_neo4j(df, driver):
+def insert_into_neo4j(chunks: Iterable[pd.DataFrame], driver):
     """
     Insert data into Neo4j as nodes and relationships.
     
+    Rows are sent NEO4J_BATCH_SIZE at a time through a single UNWIND query,
+    each batch in one managed write transaction on a shared session.
+    
     Args:
-        df: Pandas DataFrame with despesas data
+        chunks: Iterable of Pandas DataFrames with despesas data (see read_csv_chunks)
         driver: Neo4j driver instance
     """
     print("\nInserting data into Neo4j...")
     
     with driver.session() as session:
-        for idx, row in tqdm(df.iterrows(), total=len(df), desc="Neo4j"):
-            # Map columns from CSV format to database format
-            mapped = map_csv_columns(row)
-            
+        setup_neo4j_schema(session)
+        
+        progress = tqdm(desc="Neo4j", unit="rows")
+        skipped_nameless = 0
+        for df in chunks:
             # Skip if CNPJ is empty (can't create unique Fornecedor node without it)
-            if not mapped['fornecedor_cnpj']:
-                continue
-            
-            # Use MERGE to avoid duplicates
-            # Uses parameterized queries ($param) to prevent Cypher injection
-            query = """
-            MERGE (d:Deputado {nome: $deputado_nome})
-            ON CREATE SET d.partido = $deputado_partido
-            ON MATCH SET d.partido = $deputado_partido
-            
-            MERGE (f:Fornecedor {cnpj: $fornecedor_cnpj})
-            ON CREATE SET f.nome = $fornecedor_nome
-            ON MATCH SET f.nome = $fornecedor_nome
-            
-            CREATE (d)-[:PAGOU {
-                valor: $valor,
-                data: $data,
-                descricao: $descricao
-            }]->(f)
-            """
-            
-            # Note: deputado_partido is not in our mapped columns, but we keep for compatibility
-            deputado_partido = row.get('siglaPartido', row.get('deputado_partido', ''))
+            has_cnpj = df['cnpj_fornecedor'] != ''
+            # ...or if the deputado name is missing: MERGE on a null property
+            # fails, and would take the whole UNWIND batch down with it
+            has_name = df['nome_deputado'].notna()
+            skipped_nameless += int((has_cnpj & ~has_name).sum())
+            valid = df[has_cnpj & has_name].copy()
+            # Dates are stored as ISO strings on the PAGOU relationship
+            valid['data_despesa'] = [d.isoformat() if d is not None else None for d in valid['data_despesa']]
+            rows = valid.to_dict('records')
             
-            session.run(query, {
-                'deputado_nome': mapped['deputado_nome'],
-                'deputado_partido': deputado_partido,
-                'fornecedor_nome': mapped['fornecedor_nome'],
-                'fornecedor_cnpj': mapped['fornecedor_cnpj'],
-                'valor': mapped['valor'],
-                'data': str(mapped['data']),
-                'descricao': mapped['descricao']
-            })
+            for start in range(0, len(rows), NEO4J_BATCH_SIZE):
+                session.execute_write(_write_neo4j_rows, rows[start:start + NEO4J_BATCH_SIZE])
+            progress.update(len(df))
+    progress.close()
     
+    if skipped_nameless:
+        print(f"⚠ Skipped {skipped_nameless} rows without nome_deputado in Neo4j")
     print("Neo4j data insertion completed.")
 
 
+def ingest_postgresql(csv_file: str, openai_client) -> int:
+    """
+    Load the CSV into PostgreSQL: table, rows with embeddings, HNSW index.
+    
+    Opens and closes its own connection pool so it can run in a worker thread.
+    
+    If the table already holds this exact CSV (same csv_fingerprint) the load
+    is skipped, so re-running the script does not pay again for embeddings,
+    COPY and the HNSW build. Set FORCE_INGEST=1 to reload anyway.
+    
+    With EMBEDDING_BATCH_API=1 the new descriptions are embedded through
+    the Batch API (see prefill_cache_with_batch_api) before the load starts.
+    
+    Args:
+        csv_file: Path to the CSV file
+        openai_client: OpenAI client instance
+    
+    Returns:
+        int: Number of rows inserted (or already present when skipped)
+    """
+    # Connect to PostgreSQL
+    print("\nConnecting to PostgreSQL...")
+    pool = None
+    pg_conn = None
+    embedding_cache = None
+    try:
+        # Hashing the CSV is disk-bound and connecting is network-bound:
+        # read the file on a worker thread while the connection is set up
+        with ThreadPoolExecutor(max_workers=1) as hasher:
+            fingerprint_future = hasher.submit(csv_fingerprint, csv_file)
+            # minconn = maxconn: ThreadedConnectionPool closes a returned
+            # connection once it already holds minconn idle ones, which would
+            # drop the session settings below and reconnect on every batch
+            pool = ThreadedConnectionPool(POSTGRES_COPY_WORKERS, POSTGRES_COPY_WORKERS,
+                                          **get_postgres_connection_params())
+            pg_conn = pool.getconn()
+            register_vector(pg_conn)
+            print("✓ Connected to PostgreSQL")
+            loaded_fingerprint = get_loaded_fingerprint(pg_conn)
+            fingerprint = fingerprint_future.result()
+        
+        if not FORCE_INGEST and loaded_fingerprint == fingerprint:
+            cursor = pg_conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM despesas_parlamentares;")
+            records_processed = cursor.fetchone()[0]
+            cursor.close()
+            print(f"✓ PostgreSQL already holds this CSV ({records_processed} rows), skipping load "
+                  f"(set FORCE_INGEST=1 to reload)")
+            # Tables loaded before an index was introduced still get it
+            create_lexical_indexes(pg_conn)
+            return records_processed
+        
+        embedding_cache = EmbeddingCache()
+        if USE_BATCH_API:
+            # The batch job may take hours: close the pool instead of keeping
+            # idle connections open, and reconnect once the embeddings are cached.
+            # Forget the closed pool so that, if the prefill or the reconnect
+            # fails, the finally below does not close it again (psycopg2 would
+            # raise PoolError and hide the real error)
+            pool.closeall()
+            pool = None
+            prefill_cache_with_batch_api(csv_file, openai_client, embedding_cache)
+            pool = ThreadedConnectionPool(POSTGRES_COPY_WORKERS, POSTGRES_COPY_WORKERS,
+                                          **get_postgres_connection_params())
+            pg_conn = pool.getconn()
+            register_vector(pg_conn)
+        
+        # Setup PostgreSQL table
+        setup_postgresql_table(pg_conn)
+        
+        # Apply the bulk-load settings to every pooled connection; with
+        # minconn = maxconn they stay open in the pool and the COPY workers
+        # reuse them
+        copy_conns = [pg_conn] + [pool.getconn() for _ in range(POSTGRES_COPY_WORKERS - 1)]
+        for conn in copy_conns:
+            configure_bulk_load(conn)
+        for conn in copy_conns[1:]:
+            pool.putconn(conn)
+        pool.putconn(pg_conn)
+        
+        # Insert data into PostgreSQL, reusing embeddings cached by earlier runs
+        records_processed = insert_into_postgresql(
+            prefetch_chunks(read_csv_chunks(csv_file)), pool, openai_client, embedding_cache
+        )
+        
+        # A single connection builds the index once the load has finished
+        pg_conn = pool.getconn()
+        
+        # Create HNSW and lexical indexes only after every row is committed
+        create_hnsw_index(pg_conn)
+        create_lexical_indexes(pg_conn)
+        mark_loaded(pg_conn, fingerprint)
+        
+        print("✓ PostgreSQL operations completed")
+        return records_processed
+    
+    except Exception as e:
+        print(f"✗ PostgreSQL error: {e}")
+        raise
+    finally:
+        if embedding_cache:
+            embedding_cache.close()
+        if pool:
+            pool.closeall()
+            print("✓ PostgreSQL connection closed")
+
+
+def ingest_neo4j(csv_file: str):
+    """
+    Load the CSV into Neo4j as Deputado/Fornecedor nodes and PAGOU relations.
+    
+    Opens and closes its own driver so it can run in a worker thread.
+    
+    PAGOU relations are CREATEd, so loading the same CSV twice would
+    duplicate them: if the graph already holds this exact CSV the load is
+    skipped. Otherwise (a changed CSV, an interrupted earlier load, or
+    FORCE_INGEST=1) the existing PAGOU relations are deleted first, so the
+    graph ends up holding only the new CSV.
+    
+    Args:
+        csv_file: Path to the CSV file
+    """
+    # Connect to Neo4j
+    print("\nConnecting to Neo4j...")
+    neo4j_driver = None
+    try:
+        neo4j_driver = get_neo4j_driver()
+        print("✓ Connected to Neo4j")
+        
+        # As in ingest_postgresql, hash the CSV while the graph is queried
+        with ThreadPoolExecutor(max_workers=1) as hasher, neo4j_driver.session() as session:
+            fingerprint_future = hasher.submit(csv_fingerprint, csv_file, layout="neo4j")
+            loaded_fingerprint = get_neo4j_loaded_fingerprint(session)
+            fingerprint = fingerprint_future.result()
+            if not FORCE_INGEST and loaded_fingerprint == fingerprint:
+                print("✓ Neo4j already holds this CSV, skipping load (set FORCE_INGEST=1 to reload)")
+                return
+            # A load interrupted halfway must not be taken as complete
+            mark_neo4j_loaded(session, None)
+            # Also clears what an interrupted load left behind, whose
+            # fingerprint was already removed above
+            deleted = clear_neo4j_relationships(session)
+            if deleted:
+                print(f"✓ Removed {deleted} PAGOU relationships from the previous load")
+        
+        # Insert data into Neo4j
+        insert_into_neo4j(prefetch_chunks(read_csv_chunks(csv_file)), neo4j_driver)
+        
+        with neo4j_driver.session() as session:
+            mark_neo4j_loaded(session, fingerprint)
+        
+        print("✓ Neo4j operations completed")
+    
+    except Exception as e:
+        print(f"✗ Neo4j error: {e}")
+        raise
+    finally:
+        if neo4j_driver:
+            neo4j_driver.close()
+            print("✓ Neo4j connection closed")
+
+
 def main():
     """
     Main function to orchestrate the data ingestion process.
@@ -402,18 +1605,13 @@ def main():
     print("\nValidating environment variables...")
     
     # Check OpenAI API key
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not openai_api_key:
+    if not _OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY environment variable is not set")
     
     print("✓ OpenAI API key found")
     
     # Check Neo4j credentials
-    neo4j_uri = os.getenv("NEO4J_URI")
-    neo4j_username = os.getenv("NEO4J_USERNAME")
-    neo4j_password = os.getenv("NEO4J_PASSWORD")
-    
-    if not all([neo4j_uri, neo4j_username, neo4j_password]):
+    if not all([_NEO4J_URI, _NEO4J_USER, _NEO4J_PASSWORD]):
         raise ValueError(
             "Missing Neo4j credentials. "
             "Please set NEO4J_URI, NEO4J_USERNAME, and NEO4J_PASSWORD"
@@ -422,10 +1620,7 @@ def main():
     print("✓ Neo4j credentials found")
     
     # Check PostgreSQL credentials (either Supabase or standard PostgreSQL)
-    supabase_url = os.getenv("SUPABASE_URL")
-    postgres_host = os.getenv("POSTGRES_HOST")
-    
-    if not supabase_url and not postgres_host:
+    if not _SUPABASE_URL and not _POSTGRES_HOST:
         raise ValueError(
             "Missing PostgreSQL credentials. "
             "Please set either SUPABASE_URL or POSTGRES_HOST"
@@ -433,72 +1628,31 @@ def main():
     
     print("✓ PostgreSQL credentials found")
     
-    # Read CSV file
-    print(f"\nReading CSV file: {csv_file}")
-    df = pd.read_csv(csv_file)
-    print(f"✓ Loaded {len(df)} records")
+    # Read CSV file lazily; each stage streams the file in chunks of CSV_CHUNK_SIZE rows
+    print(f"\nReading CSV file: {csv_file} (chunks of {CSV_CHUNK_SIZE} rows)")
     
     # Display sample data
     print("\nSample data (first 3 rows):")
-    print(df.head(3))
+    print(pd.read_csv(csv_file, nrows=3))
     
     # Initialize OpenAI client
     print("\nInitializing OpenAI client...")
-    openai_client = openai.OpenAI(api_key=openai_api_key)
+    openai_client = create_openai_client(_OPENAI_API_KEY)
     print("✓ OpenAI client initialized")
     
-    # Connect to PostgreSQL
-    print("\nConnecting to PostgreSQL...")
-    pg_conn = None
-    try:
-        pg_conn = get_postgres_connection()
-        register_vector(pg_conn)
-        print("✓ Connected to PostgreSQL")
-        
-        # Setup PostgreSQL table
-        setup_postgresql_table(pg_conn)
-        
-        # Insert data into PostgreSQL
-        insert_into_postgresql(df, pg_conn, openai_client)
-        
-        # Create HNSW index
-        create_hnsw_index(pg_conn)
-        
-        print("✓ PostgreSQL operations completed")
-        
-    except Exception as e:
-        print(f"✗ PostgreSQL error: {e}")
-        raise
-    finally:
-        if pg_conn:
-            pg_conn.close()
-            print("✓ PostgreSQL connection closed")
-    
-    # Connect to Neo4j
-    print("\nConnecting to Neo4j...")
-    neo4j_driver = None
-    try:
-        neo4j_driver = get_neo4j_driver()
-        print("✓ Connected to Neo4j")
-        
-        # Insert data into Neo4j
-        insert_into_neo4j(df, neo4j_driver)
-        
-        print("✓ Neo4j operations completed")
-        
-    except Exception as e:
-        print(f"✗ Neo4j error: {e}")
-        raise
-    finally:
-        if neo4j_driver:
-            neo4j_driver.close()
-            print("✓ Neo4j connection closed")
+    # PostgreSQL and Neo4j are independent sinks: load both at the same time,
+    # each with its own connection and its own pass over the CSV
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pg_future = executor.submit(ingest_postgresql, csv_file, openai_client)
+        neo4j_future = executor.submit(ingest_neo4j, csv_file)
+        records_processed = pg_future.result()
+        neo4j_future.result()
     
     print("\n" + "=" * 60)
     print("Data ingestion completed successfully!")
     print("=" * 60)
     print(f"\nSummary:")
-    print(f"  - Records processed: {len(df)}")
+    print(f"  - Records processed: {records_processed}")
     print(f"  - PostgreSQL: Table 'despesas_parlamentares' populated with embeddings")
     print(f"  - Neo4j: Nodes and relationships created")
     print("=" * 60)
@@ -19,87 +19,214 @@ Data: 2025
 import os
 import sys
 import subprocess
+import threading
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
-
-def check_and_run_etl():
+# Tempo máximo (segundos) para o ETL baixar os dados
+ETL_TIMEOUT = 600
+# Linhas lidas do CSV por vez: o dataset completo nunca é carregado inteiro
+CSV_CHUNK_SIZE = 50_000
+# Tamanho da amostra com as maiores despesas
+SAMPLE_SIZE = 50
+# Colunas geradas pelo etl_camara.py
+ETL_COLUMNS = [
+    'nome', 'siglaPartido', 'siglaUf', 'txtDescricao',
+    'vlrLiquido', 'txtFornecedor', 'cnpjCpfFornecedor', 'datEmissao'
+]
+# Tipos definidos na leitura: nomes repetidos como category e CNPJ como
+# texto (preserva zeros à esquerda); vlrLiquido fica float64 para que as
+# somas em reais não percam centavos
+ETL_DTYPES = {
+    'nome': 'category',
+    'siglaPartido': 'category',
+    'siglaUf': 'category',
+    'txtDescricao': 'category',
+    'txtFornecedor': 'category',
+    'cnpjCpfFornecedor': 'string'
+}
+
+
+def _run_etl_in_process(csv_file):
     """
-    Verifica se o arquivo despesas_camara.csv existe.
-    Se não existir, executa o módulo etl_camara.py para baixá-lo.
+    Executa etl_camara.main() no próprio processo, sem iniciar outro interpretador.
+    
+    O ETL roda em uma thread daemon para que o limite de ETL_TIMEOUT possa ser
+    aplicado sem depender de sinais (signal.alarm só funciona na thread
+    principal e não existe no Windows).
+    
+    Args:
+        csv_file: Caminho do CSV a ser gerado
+    
+    Returns:
+        bool: True se o ETL terminou sem erros dentro do tempo limite
+    
+    Raises:
+        ImportError: Se o módulo etl_camara não puder ser importado
     """
-    csv_file = "despesas_camara.csv"
+    import etl_camara
     
-    if os.path.exists(csv_file):
-        print(f"✓ Arquivo {csv_file} encontrado.")
-        return True
+    errors = []
     
-    print(f"✗ Arquivo {csv_file} não encontrado.")
-    print("Executando etl_camara.py para baixar os dados...")
+    def run():
+        try:
+            etl_camara.main(output_file=csv_file)
+        except Exception as e:
+            errors.append(e)
+    
+    worker = threading.Thread(target=run, name="etl_camara", daemon=True)
+    worker.start()
+    worker.join(ETL_TIMEOUT)
     
+    if worker.is_alive():
+        print(f"✗ Erro: ETL excedeu o tempo limite de {ETL_TIMEOUT // 60} minutos.")
+        return False
+    if errors:
+        print(f"✗ Erro ao executar ETL: {errors[0]}")
+        return False
+    return True
+
+
+def _run_etl_subprocess():
+    """
+    Executa etl_camara.py em um novo processo Python (fallback).
+    
+    Returns:
+        bool: True se o processo terminou com sucesso dentro do tempo limite
+    """
     try:
         # Executa o script ETL
         result = subprocess.run(
             [sys.executable, "etl_camara.py"],
             capture_output=True,
             text=True,
-            timeout=600  # 10 minutos de timeout
+            timeout=ETL_TIMEOUT
         )
         
-        if result.returncode == 0:
-            print("✓ ETL executado com sucesso!")
-            if os.path.exists(csv_file):
-                return True
-            else:
-                print(f"✗ Erro: ETL executado mas {csv_file} não foi criado.")
-                return False
-        else:
+        if result.returncode != 0:
             print(f"✗ Erro ao executar ETL:")
             print(result.stderr)
             return False
-            
+        return True
+    
     except subprocess.TimeoutExpired:
-        print("✗ Erro: ETL excedeu o tempo limite de 10 minutos.")
+        print(f"✗ Erro: ETL excedeu o tempo limite de {ETL_TIMEOUT // 60} minutos.")
         return False
     except Exception as e:
         print(f"✗ Erro ao executar ETL: {e}")
         return False
 
 
-def load_and_validate_data(csv_file="despesas_camara.csv"):
+def check_and_run_etl(csv_file="despesas_camara.csv"):
     """
-    Carrega o CSV completo e valida os dados.
+    Verifica se o arquivo despesas_camara.csv existe.
+    Se não existir, executa o ETL (etl_camara.main) para baixá-lo.
+    
+    O ETL é importado e executado no próprio processo; só se o módulo não
+    puder ser importado o script é executado em um subprocesso.
+    
+    Args:
+        csv_file: Caminho do CSV esperado (padrão: despesas_camara.csv)
+    """
+    if os.path.exists(csv_file):
+        print(f"✓ Arquivo {csv_file} encontrado.")
+        return True
+    
+    print(f"✗ Arquivo {csv_file} não encontrado.")
+    print("Executando etl_camara.py para baixar os dados...")
+    
+    try:
+        success = _run_etl_in_process(csv_file)
+    except ImportError as e:
+        print(f"⚠ Não foi possível importar etl_camara ({e}); executando em subprocesso...")
+        success = _run_etl_subprocess()
+    
+    if not success:
+        return False
+    
+    print("✓ ETL executado com sucesso!")
+    if os.path.exists(csv_file):
+        return True
+    print(f"✗ Erro: ETL executado mas {csv_file} não foi criado.")
+    return False
+
+
+def load_and_validate_data(csv_file="despesas_camara.csv", chunksize=CSV_CHUNK_SIZE):
+    """
+    Percorre o CSV em chunks e valida os dados sem carregar o arquivo inteiro.
+    
+    Em uma única passada calcula as estatísticas, mantém as SAMPLE_SIZE
+    linhas de maior valor (top-K incremental) e acumula soma/quantidade por
+    fornecedor, de modo que a memória usada é limitada a um chunk.
+    
+    Args:
+        csv_file: Caminho do CSV gerado pelo ETL
+        chunksize: Linhas lidas por vez (padrão: CSV_CHUNK_SIZE)
     
     Returns:
-        tuple: (DataFrame, estatísticas) ou (None, None) em caso de erro
+        tuple: (DataFrame com as maiores despesas, estatísticas) ou (None, None) em caso de erro.
+        As estatísticas incluem 'suppliers', o total e a quantidade de despesas por fornecedor.
     """
     try:
-        print(f"\nCarregando {csv_file}...")
-        df = pd.read_csv(csv_file)
+        print(f"\nCarregando {csv_file} (chunks de {chunksize:,} linhas)...")
+        reader = pd.read_csv(
+            csv_file,
+            chunksize=chunksize,
+            usecols=lambda column: column in ETL_COLUMNS,
+            dtype=ETL_DTYPES,
+            parse_dates=['datEmissao']
+        )
+        
+        total_rows = 0
+        total_value = 0.0
+        date_mins, date_maxs = [], []
+        top_rows = None
+        suppliers = None
+        
+        for chunk in reader:
+            # Converte vlrLiquido para numérico, tratando erros; datas que a
+            # leitura não conseguiu interpretar viram NaT
+            chunk['vlrLiquido'] = pd.to_numeric(chunk['vlrLiquido'], errors='coerce')
+            if not pd.api.types.is_datetime64_any_dtype(chunk['datEmissao']):
+                chunk['datEmissao'] = pd.to_datetime(chunk['datEmissao'], errors='coerce')
+            
+            total_rows += len(chunk)
+            total_value += chunk['vlrLiquido'].sum()
+            date_mins.append(chunk['datEmissao'].min())
+            date_maxs.append(chunk['datEmissao'].max())
+            
+            # Top-K incremental: só as maiores linhas de cada chunk são mantidas
+            chunk_top = chunk.nlargest(SAMPLE_SIZE, 'vlrLiquido')
+            if top_rows is None:
+                top_rows = chunk_top
+            else:
+                top_rows = pd.concat([top_rows, chunk_top]).nlargest(SAMPLE_SIZE, 'vlrLiquido')
+            
+            # Soma e quantidade por fornecedor, acumuladas entre chunks
+            chunk_suppliers = chunk.groupby('txtFornecedor', observed=True)['vlrLiquido'].agg(['sum', 'count'])
+            # As categorias variam entre chunks: alinha pelos nomes, não pelos códigos
+            chunk_suppliers.index = chunk_suppliers.index.astype(object)
+            if suppliers is None:
+                suppliers = chunk_suppliers
+            else:
+                suppliers = suppliers.add(chunk_suppliers, fill_value=0)
         
         # Validação básica
-        if df.empty:
+        if total_rows == 0:
             print("✗ Erro: Dataset vazio!")
             return None, None
         
-        # Calcula estatísticas
-        total_rows = len(df)
-        
-        # Converte vlrLiquido para numérico, tratando erros
-        df['vlrLiquido'] = pd.to_numeric(df['vlrLiquido'], errors='coerce')
-        total_value = df['vlrLiquido'].sum()
-        
-        # Converte datas e encontra min/max
-        df['datEmissao'] = pd.to_datetime(df['datEmissao'], errors='coerce')
-        date_min = df['datEmissao'].min()
-        date_max = df['datEmissao'].max()
+        date_min = pd.Series(date_mins).min()
+        date_max = pd.Series(date_maxs).max()
+        suppliers['count'] = suppliers['count'].astype(int)
         
         stats = {
             'total_rows': total_rows,
             'total_value': total_value,
             'date_min': date_min,
-            'date_max': date_max
+            'date_max': date_max,
+            'suppliers': suppliers
         }
         
         print(f"✓ Dataset carregado com sucesso!")
@@ -107,7 +234,7 @@ def load_and_validate_data(csv_file="despesas_camara.csv"):
         print(f"  - Valor total: R$ {total_value:,.2f}")
         print(f"  - Período: {date_min.strftime('%Y-%m-%d') if pd.notna(date_min) else 'N/A'} a {date_max.strftime('%Y-%m-%d') if pd.notna(date_max) else 'N/A'}")
         
-        return df, stats
+        return top_rows.reset_index(drop=True), stats
         
     except FileNotFoundError:
         print(f"✗ Erro: Arquivo {csv_file} não encontrado!")
@@ -122,7 +249,7 @@ def create_sample_top50(df, output_dir="data"):
     Extrai as top 50 linhas com maiores valores e salva em arquivo separado.
     
     Args:
-        df: DataFrame com os dados completos
+        df: DataFrame com as maiores despesas (ver load_and_validate_data)
         output_dir: Diretório de saída (padrão: 'data')
     """
     try:
@@ -147,20 +274,19 @@ def create_sample_top50(df, output_dir="data"):
         return None
 
 
-def get_top_suppliers(df, top_n=5):
+def get_top_suppliers(supplier_totals, top_n=5):
     """
-    Agrega os top N fornecedores por valor total recebido.
+    Seleciona os top N fornecedores por valor total recebido.
     
     Args:
-        df: DataFrame com os dados
+        supplier_totals: Soma e quantidade por fornecedor (stats['suppliers'])
         top_n: Número de fornecedores a retornar (padrão: 5)
         
     Returns:
         DataFrame com os top fornecedores
     """
     try:
-        # Agrupa por fornecedor e soma valores
-        suppliers = df.groupby('txtFornecedor')['vlrLiquido'].agg(['sum', 'count']).reset_index()
+        suppliers = supplier_totals[['sum', 'count']].reset_index()
         suppliers.columns = ['Fornecedor', 'Valor Total (R$)', 'Quantidade de Despesas']
         
         # Ordena por valor total decrescente
@@ -178,7 +304,7 @@ def generate_data_dictionary(df, stats, top_suppliers):
     Gera o arquivo DATA_DICTIONARY.md com informações sobre o dataset.
     
     Args:
-        df: DataFrame com os dados
+        df: DataFrame com as maiores despesas (define o schema documentado)
         stats: Dicionário com estatísticas do dataset
         top_suppliers: DataFrame com top fornecedores
     """
@@ -194,7 +320,7 @@ def generate_data_dictionary(df, stats, top_suppliers):
                 dtype_friendly = 'Inteiro'
             elif dtype.startswith('float'):
                 dtype_friendly = 'Decimal'
-            elif dtype.startswith('object'):
+            elif dtype.startswith(('object', 'str', 'category')):
                 dtype_friendly = 'Texto'
             elif dtype.startswith('datetime'):
                 dtype_friendly = 'Data'
@@ -242,8 +368,8 @@ Dataset extraído em **{today}** contendo **{stats['total_rows']:,}** registros
             content += "| Posição | Fornecedor | Valor Total (R$) | Qtd. Despesas |\n"
             content += "|---------|------------|------------------|---------------|\n"
             
-            for pos, (idx, row) in enumerate(top_suppliers.iterrows(), 1):
-                content += f"| {pos}º | {row['Fornecedor']} | R$ {row['Valor Total (R$)']:,.2f} | {int(row['Quantidade de Despesas'])} |\n"
+            for pos, (fornecedor, total, qtd) in enumerate(top_suppliers.itertuples(index=False, name=None), 1):
+                content += f"| {pos}º | {fornecedor} | R$ {total:,.2f} | {int(qtd)} |\n"
         else:
             content += "*Dados não disponíveis*\n"
         
@@ -370,7 +496,7 @@ def main():
     
     # Passo 4: Gerar dicionário de dados
     print("\n[Passo 4/4] Gerando dicionário de dados...")
-    top_suppliers = get_top_suppliers(df)
+    top_suppliers = get_top_suppliers(stats['suppliers'])
     dict_file = generate_data_dictionary(df, stats, top_suppliers)
     if dict_file is None:
         print("\n✗ Falha ao criar dicionário. Abortando.")
@@ -10,20 +10,27 @@ Funções Testadas:
 1. sanitize_cnpj(): Limpeza e normalização de CNPJs
 2. convert_valor(): Conversão de valores monetários
 3. reciprocal_rank_fusion(): Algoritmo RRF para fusão de rankings
+4. Equivalência de ingest_data.py e auditor_ai.py com as implementações de referência
+5. ingest_postgresql(): Propagação de erros da Batch API
 
 Autor: Tavs Coelho - Universidade Federal de Goiás (UFG)
 Curso: Aprendizado de Máquina
 """
 
+import sys
+import numpy as np
 import pandas as pd
 
 
-# Replicate functions locally to avoid import dependencies
+# Replicate functions locally to avoid import dependencies. These are plain
+# reference implementations (the oracle), deliberately not copies of the
+# optimized code in ingest_data.py / auditor_ai.py: test_replicas_match_sources
+# checks the real functions against them
 def sanitize_cnpj(cnpj_str):
-    """Sanitize CNPJ by removing dots, dashes, and slashes."""
+    """Sanitize CNPJ by removing dots, dashes, slashes, and whitespace."""
     if pd.isna(cnpj_str) or not cnpj_str:
         return ""
-    return str(cnpj_str).replace('.', '').replace('-', '').replace('/', '').strip()
+    return ''.join(char for char in str(cnpj_str) if char not in './-' and not char.isspace())
 
 
 def convert_valor(valor_str):
@@ -42,7 +49,7 @@ def convert_valor(valor_str):
         return 0.0
 
 
-def reciprocal_rank_fusion(search_results, k=60):
+def reciprocal_rank_fusion(search_results, k=60, top_n=None):
     """Applies Reciprocal Rank Fusion (RRF) to combine multiple search results."""
     rrf_scores = {}
     
@@ -51,10 +58,12 @@ def reciprocal_rank_fusion(search_results, k=60):
             score_contribution = 1 / (k + rank)
             rrf_scores[item_id] = rrf_scores.get(item_id, 0) + score_contribution
     
-    df = pd.DataFrame(list(rrf_scores.items()), columns=['despesa_id', 'rrf_score'])
-    df = df.sort_values(by='rrf_score', ascending=False).reset_index(drop=True)
+    # sorted é estável: empates mantêm a ordem da primeira aparição
+    ranked = sorted(rrf_scores.items(), key=lambda item: item[1], reverse=True)
+    if top_n is not None:
+        ranked = ranked[:max(top_n, 0)]
     
-    return df
+    return pd.DataFrame(ranked, columns=['despesa_id', 'rrf_score'])
 
 
 def test_sanitize_cnpj():
@@ -77,6 +86,7 @@ def test_sanitize_cnpj():
         ("12.345.678/0001-90", "12345678000190"),
         ("12345678000190", "12345678000190"),
         ("12.345.678/0001-90  ", "12345678000190"),  # with whitespace
+        ("12 345 678 0001 90", "12345678000190"),  # with inner whitespace
         ("", ""),
         (None, ""),
         (pd.NA, ""),
@@ -216,6 +226,12 @@ def test_rrf_scoring():
     
     top_item = result.iloc[0]['despesa_id']
     
+    # Pedir apenas o topo deve retornar o mesmo prefixo do ranking completo
+    top_result = reciprocal_rank_fusion(search_results, k=60, top_n=3)
+    if top_result['despesa_id'].tolist() != result['despesa_id'].head(3).tolist():
+        print(f"✗ FAIL: top_n=3 returned {top_result['despesa_id'].tolist()}")
+        return False
+    
     if top_item == 'id1':
         print(f"✓ PASS: id1 has highest score (appears in all lists)")
         print(f"  Top 3: {result.head(3)[['despesa_id', 'rrf_score']].to_dict('records')}")
@@ -225,6 +241,166 @@ def test_rrf_scoring():
         return False
 
 
+def _skip_unimportable(error):
+    """Pula o teste (no pytest) quando os módulos do projeto não podem ser importados."""
+    if 'pytest' in sys.modules:
+        sys.modules['pytest'].skip(f"project modules not importable ({error})")
+    print(f"⚠ SKIP: project modules not importable ({error})")
+
+
+def _assert_rrf_matches(source, expected, label):
+    """Compara um ranking do auditor_ai (DataFrame ou pares) com o de referência."""
+    if isinstance(source, pd.DataFrame):
+        source = list(zip(source['despesa_id'].tolist(), source['rrf_score'].tolist()))
+    expected = list(zip(expected['despesa_id'].tolist(), expected['rrf_score'].tolist()))
+    assert [despesa_id for despesa_id, _ in source] == [despesa_id for despesa_id, _ in expected], \
+        f"{label}: ranking differs from the reference"
+    assert np.allclose([score for _, score in source], [score for _, score in expected]), \
+        f"{label}: scores differ from the reference"
+
+
+def test_replicas_match_sources():
+    """
+    Compara as funções do projeto com as implementações de referência acima.
+    
+    As funções de ingest_data.py e auditor_ai.py são otimizadas (caminhos
+    rápidos, versões vetorizadas); as de referência são diretas e servem de
+    oráculo. Quando os módulos podem ser importados (dependências instaladas),
+    as saídas precisam coincidir; caso contrário o teste é pulado.
+    
+    Objetivo: Garantir que as otimizações não mudam os resultados
+    """
+    print("\n=== Testing project functions against the reference implementations ===")
+    
+    try:
+        import ingest_data
+        import auditor_ai
+    except ImportError as e:
+        _skip_unimportable(e)
+        return
+    
+    cnpj_inputs = ["12.345.678/0001-90", "123.456.789-00", " 12 345 ", "12.345\t678\n", "",
+                   None, pd.NA, float("nan"), 12345678000190]
+    for value in cnpj_inputs:
+        assert ingest_data.sanitize_cnpj(value) == sanitize_cnpj(value), \
+            f"sanitize_cnpj({value!r}) differs from the reference"
+    
+    cnpj_column = pd.Series(cnpj_inputs, dtype=object)
+    assert ingest_data.sanitize_cnpj_series(cnpj_column).tolist() == [sanitize_cnpj(value) for value in cnpj_inputs], \
+        "sanitize_cnpj_series differs from the reference"
+    
+    valor_inputs = ["1234.56", "1234,56", "R$ 1234.56", "abc", "", None, pd.NA, float("nan"), 1234, 1234.56]
+    for value in valor_inputs:
+        assert ingest_data.convert_valor(value) == convert_valor(value), \
+            f"convert_valor({value!r}) differs from the reference"
+    
+    valor_column = pd.Series(valor_inputs, dtype=object)
+    assert ingest_data.convert_valor_series(valor_column).tolist() == [convert_valor(value) for value in valor_inputs], \
+        "convert_valor_series differs from the reference"
+    
+    # Os dois caminhos do RRF: poucos itens (dicionário) e >= 1000 (vetorizado),
+    # com empates, IDs repetidos e listas vazias
+    rrf_inputs = [
+        [[], []],
+        [['id1', 'id2', 'id3'], ['id1', 'id4'], ['id2', 'id1', 'id5']],
+        [['x', 'y'], ['y', 'x'], []],
+        [[f'{name}{i % 300}' for i in range(400)] for name in ('a', 'b', 'a')],
+        [['id1'] + [f'{name}{i}' for i in range(400)] for name in ('a', 'b', 'c')],
+    ]
+    for search_results in rrf_inputs:
+        for top_n in (None, 0, 1, 3, 10_000):
+            expected = reciprocal_rank_fusion(search_results, k=60, top_n=top_n)
+            label = f"reciprocal_rank_fusion({sum(map(len, search_results))} items, top_n={top_n})"
+            _assert_rrf_matches(
+                auditor_ai.reciprocal_rank_fusion(search_results, k=60, top_n=top_n), expected, label
+            )
+            _assert_rrf_matches(
+                auditor_ai.reciprocal_rank_fusion(search_results, k=60, top_n=top_n, as_dataframe=False),
+                expected, f"{label}, as_dataframe=False"
+            )
+    
+    print("✓ PASS: project functions match the reference implementations")
+
+
+def test_batch_api_error_propagates():
+    """
+    Testa se um erro da Batch API chega intacto a quem chamou ingest_postgresql.
+    
+    Com EMBEDDING_BATCH_API=1 o pool é fechado antes do prefill; se o prefill
+    falhar, o finally não pode fechar o pool de novo (o psycopg2 levantaria
+    PoolError e esconderia o erro original). Bancos e API são substituídos
+    por objetos falsos, então o teste roda sem conexões.
+    
+    Objetivo: Garantir que a falha real (e não um PoolError) seja reportada
+    """
+    print("\n=== Testing ingest_postgresql error propagation ===")
+    
+    try:
+        import ingest_data
+        from psycopg2.pool import PoolError
+    except ImportError as e:
+        _skip_unimportable(e)
+        return
+    
+    class ClosingPool:
+        """Pool falso que, como o do psycopg2, recusa ser fechado duas vezes."""
+        def __init__(self, *args, **kwargs):
+            self.closed = False
+        
+        def getconn(self):
+            return object()
+        
+        def closeall(self):
+            if self.closed:
+                raise PoolError("connection pool is closed")
+            self.closed = True
+    
+    class NoCache:
+        def close(self):
+            pass
+    
+    def failing_prefill(csv_file, client, cache):
+        raise RuntimeError("batch job failed")
+    
+    patches = {
+        'ThreadedConnectionPool': ClosingPool,
+        'register_vector': lambda conn: None,
+        'csv_fingerprint': lambda csv_file, **kwargs: 'fingerprint',
+        'get_loaded_fingerprint': lambda conn: None,
+        'EmbeddingCache': NoCache,
+        'prefill_cache_with_batch_api': failing_prefill,
+        'USE_BATCH_API': True,
+        'FORCE_INGEST': False,
+    }
+    originals = {name: getattr(ingest_data, name) for name in patches}
+    try:
+        for name, value in patches.items():
+            setattr(ingest_data, name, value)
+        try:
+            ingest_data.ingest_postgresql("despesas_camara.csv", openai_client=None)
+        except RuntimeError as e:
+            assert str(e) == "batch job failed", f"unexpected RuntimeError: {e}"
+        except PoolError as e:
+            raise AssertionError(f"Batch API error masked by PoolError: {e}")
+        else:
+            raise AssertionError("ingest_postgresql did not raise")
+    finally:
+        for name, value in originals.items():
+            setattr(ingest_data, name, value)
+    
+    print("✓ PASS: Batch API error propagates unchanged")
+
+
+def _passes(test):
+    """Executa um teste que usa assert, para o relatório de run_all_tests."""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"✗ FAIL: {e}")
+        return False
+    return True
+
+
 def run_all_tests():
     """
     Executa todos os testes e gera relatório.
@@ -238,10 +414,15 @@ def run_all_tests():
     
     results = []
     
+    # Sequencial de propósito: os testes levam poucos milissegundos e o tempo
+    # da suíte é quase todo o import de ingest_data/auditor_ai (GIL), que não
+    # ganha nada em threads; em paralelo só as mensagens se misturariam
     results.append(("sanitize_cnpj", test_sanitize_cnpj()))
     results.append(("convert_valor", test_convert_valor()))
     results.append(("RRF empty lists", test_rrf_empty_lists()))
     results.append(("RRF scoring", test_rrf_scoring()))
+    results.append(("Matches reference implementations", _passes(test_replicas_match_sources)))
+    results.append(("Batch API error propagates", _passes(test_batch_api_error_propagates)))
     
     print("\n" + "="*60)
     print("TEST SUMMARY")
@@ -265,6 +446,5 @@ def run_all_tests():
 
 
 if __name__ == "__main__":
-    import sys
     success = run_all_tests()
     sys.exit(0 if success else 1)